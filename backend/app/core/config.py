@@ -7,29 +7,50 @@ from firebase_admin import credentials, firestore, auth as firebase_auth
 import cloudinary
 import cloudinary.uploader
 from dotenv import load_dotenv
+from app.core.firestore_accounting import instrument
 
 # Load .env from backend root (only exists in local dev)
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
 
-# --- Firebase Admin SDK ---
-# Option 1: Base64-encoded service account JSON (for Render / cloud)
-# Option 2: File path (for local development)
-_sa_json_b64 = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
-
-if not firebase_admin._apps:
-    if _sa_json_b64:
-        # Decode base64 → JSON dict → Firebase credential
-        sa_dict = json.loads(base64.b64decode(_sa_json_b64))
-        cred = credentials.Certificate(sa_dict)
-    else:
-        # Fallback to local file
-        _cred_path = os.path.join(
-            os.path.dirname(__file__), "..", "..", os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "serviceAccountKey.json")
-        )
-        cred = credentials.Certificate(os.path.normpath(_cred_path))
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+# --- Storage ---
+# firebase_service talks to whatever `db` is: the Firestore client, or a local
+# stand-in with the same API (app/storage/):
+#   firestore  the real project (default; needs service-account credentials)
+#   memory     in-process dicts – zero latency, lost on exit (load tests, dev)
+#   sqlite     one local file at SQLITE_PATH (CI, offline dev with persistence)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "ecomap.sqlite3")
+
+if STORAGE_BACKEND == "firestore":
+    # --- Firebase Admin SDK ---
+    # Option 1: Base64-encoded service account JSON (for Render / cloud)
+    # Option 2: File path (for local development)
+    _sa_json_b64 = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
+
+    if not firebase_admin._apps:
+        if _sa_json_b64:
+            # Decode base64 → JSON dict → Firebase credential
+            sa_dict = json.loads(base64.b64decode(_sa_json_b64))
+            cred = credentials.Certificate(sa_dict)
+        else:
+            # Fallback to local file
+            _cred_path = os.path.join(
+                os.path.dirname(__file__), "..", "..", os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "serviceAccountKey.json")
+            )
+            cred = credentials.Certificate(os.path.normpath(_cred_path))
+        firebase_admin.initialize_app(cred)
+    _client = firestore.client()
+elif STORAGE_BACKEND == "memory":
+    from app.storage.memory import MemoryClient
+    _client = MemoryClient()
+elif STORAGE_BACKEND == "sqlite":
+    from app.storage.sqlite import SqliteClient
+    _client = SqliteClient(SQLITE_PATH)
+else:
+    raise RuntimeError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}' (expected firestore, memory or sqlite)")
+
+# Wrapped so each request's Firestore round trips are counted
+db = instrument(_client)
 admin_auth = firebase_auth
 
 # --- Cloudinary ---
@@ -40,15 +61,73 @@ cloudinary.config(
     secure=True,
 )
 
+# Upload concurrency per worker and per-upload timeout (seconds)
+CLOUDINARY_MAX_CONCURRENT_UPLOADS = int(os.getenv("CLOUDINARY_MAX_CONCURRENT_UPLOADS", "4"))
+CLOUDINARY_UPLOAD_TIMEOUT = float(os.getenv("CLOUDINARY_UPLOAD_TIMEOUT", "60"))
+
 # --- Roboflow ---
 ROBOFLOW_API_KEY = os.getenv("ROBOFLOW_API_KEY", "")
 ROBOFLOW_WORKSPACE = os.getenv("ROBOFLOW_WORKSPACE", "raymunds-workspace")
 ROBOFLOW_WORKFLOW_ID = os.getenv("ROBOFLOW_WORKFLOW_ID", "detect-count-and-visualize-2")
 
+# Detection result cache (keyed by image hash). Set INFERENCE_CACHE_DIR to
+# also persist results on disk across restarts.
+INFERENCE_CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_SIZE", "256"))
+INFERENCE_CACHE_TTL_SECONDS = float(os.getenv("INFERENCE_CACHE_TTL_SECONDS", "3600"))
+INFERENCE_CACHE_DIR = os.getenv("INFERENCE_CACHE_DIR", "")
+
+# Requests arriving within this window share one batched workflow call
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "25"))
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+
+# Admission control: concurrent workflow calls per worker, how many requests
+# may wait for one, and how long they may wait before getting a 503
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "4"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+INFERENCE_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("INFERENCE_MAX_QUEUE_WAIT_SECONDS", "10"))
+INFERENCE_RETRY_AFTER_SECONDS = int(os.getenv("INFERENCE_RETRY_AFTER_SECONDS", "5"))
+
+# Latency budget per Roboflow call, and the circuit breaker around it
+ROBOFLOW_TIMEOUT_SECONDS = float(os.getenv("ROBOFLOW_TIMEOUT_SECONDS", "8"))
+ROBOFLOW_BREAKER_FAILURES = int(os.getenv("ROBOFLOW_BREAKER_FAILURES", "5"))
+ROBOFLOW_BREAKER_RESET_SECONDS = float(os.getenv("ROBOFLOW_BREAKER_RESET_SECONDS", "30"))
+
+# Detection post-processing: drop boxes below this confidence, and suppress
+# overlapping boxes above this IoU (0 disables NMS)
+INFERENCE_MIN_CONFIDENCE = float(os.getenv("INFERENCE_MIN_CONFIDENCE", "0"))
+INFERENCE_NMS_IOU = float(os.getenv("INFERENCE_NMS_IOU", "0"))
+
 # --- Report Cooldown ---
 # Minimum hours between reports from the same user (globally) and
 # between any reports within REPORT_RADIUS_METERS of each other.
 REPORT_COOLDOWN_HOURS = float(os.getenv("REPORT_COOLDOWN_HOURS", "4"))
 REPORT_RADIUS_METERS = float(os.getenv("REPORT_RADIUS_METERS", "10"))
 
+# --- Heatmap ---
+# How long the binned report locations are served before re-reading Firestore,
+# and how many cells per side each map tile is divided into.
+HEATMAP_CACHE_SECONDS = float(os.getenv("HEATMAP_CACHE_SECONDS", "60"))
+HEATMAP_TILE_BINS = int(os.getenv("HEATMAP_TILE_BINS", "16"))
+
+# --- Firestore ---
+# Size of the thread pool the async routes use for blocking Firestore calls.
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+# Debug: add an X-Firestore-RPCs header (round trips, reads, writes, docs, ms) to every response.
+FIRESTORE_RPC_HEADER = os.getenv("FIRESTORE_RPC_HEADER", "").lower() in ("1", "true", "yes")
+
+# --- User cache ---
+# get_user() results kept per worker; this worker's own writes update the
+# cached copy, other workers' writes show up after the TTL. 0 entries disables.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "2048"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+# --- Rewards catalog ---
+# Snapshot listeners only deliver on changes; after this long without a
+# snapshot the catalog resubscribes (a full re-read) in case a listener died.
+REWARDS_CATALOG_MAX_AGE_SECONDS = float(os.getenv("REWARDS_CATALOG_MAX_AGE_SECONDS", "600"))
 
+# --- Logging ---
+# LOG_LEVEL=DEBUG shows per-request detail; LOG_FORMAT is "json" or "text".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
@@ -0,0 +1,207 @@
+"""
+Per-request Firestore RPC accounting.
+
+`instrument(client)` wraps the Firestore client so every reference, query,
+batch and transaction derived from it counts its round trips into the
+RpcStats of the current request (a contextvar set by the HTTP middleware):
+
+    reads   document gets, query streams, get_all calls
+    writes  set / update / create / delete / add, batch and transaction commits
+    docs    documents returned by reads
+    rpcs    all round trips, including transaction begin / rollback
+    seconds wall time spent inside those calls
+
+Outside a request (scripts, startup) the calls are still made, just not counted.
+"""
+import contextvars
+import threading
+import time
+from app.core import metrics
+
+_current: contextvars.ContextVar["RpcStats | None"] = contextvars.ContextVar("firestore_rpc_stats", default=None)
+
+# Method names that derive a new reference / query from the wrapped object
+_CHAINING = {
+    "collection", "collection_group", "document", "parent",
+    "where", "order_by", "limit", "limit_to_last", "offset", "select",
+    "start_at", "start_after", "end_at", "end_before",
+    "batch", "transaction", "bulk_writer",
+}
+_DOC_WRITES = {"set", "update", "create", "delete"}
+_BATCH_OPS = {"set", "update", "create", "delete"}
+
+FIRESTORE_RPCS = metrics.counter(
+    "ecomap_firestore_rpcs_total", "Firestore round trips by kind", ("kind",),
+)
+FIRESTORE_DOCS_READ = metrics.counter(
+    "ecomap_firestore_documents_read_total", "Documents returned by Firestore reads",
+)
+
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+REQUEST_READS = metrics.histogram(
+    "ecomap_firestore_reads_per_request", "Firestore read RPCs per HTTP request", ("route",), _COUNT_BUCKETS,
+)
+REQUEST_WRITES = metrics.histogram(
+    "ecomap_firestore_writes_per_request", "Firestore documents written per HTTP request", ("route",), _COUNT_BUCKETS,
+)
+REQUEST_DOCS = metrics.histogram(
+    "ecomap_firestore_docs_per_request", "Firestore documents read per HTTP request", ("route",), _COUNT_BUCKETS,
+)
+REQUEST_SECONDS = metrics.histogram(
+    "ecomap_firestore_seconds_per_request", "Wall time in Firestore calls per HTTP request", ("route",),
+)
+
+
+class RpcStats:
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.docs = 0
+        self.rpcs = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, reads: int = 0, writes: int = 0, docs: int = 0, rpcs: int = 1, seconds: float = 0.0) -> None:
+        with self._lock:
+            self.reads += reads
+            self.writes += writes
+            self.docs += docs
+            self.rpcs += rpcs
+            self.seconds += seconds
+
+    def header_value(self) -> str:
+        return f"rpcs={self.rpcs};reads={self.reads};writes={self.writes};docs={self.docs};ms={self.seconds * 1000:.1f}"
+
+
+def start_request() -> tuple[RpcStats, contextvars.Token]:
+    stats = RpcStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def current() -> RpcStats | None:
+    return _current.get()
+
+
+def observe_request(route: str, stats: RpcStats) -> None:
+    """Fold one request's totals into the per-route histograms."""
+    REQUEST_READS.observe(stats.reads, route=route)
+    REQUEST_WRITES.observe(stats.writes, route=route)
+    REQUEST_DOCS.observe(stats.docs, route=route)
+    REQUEST_SECONDS.observe(stats.seconds, route=route)
+
+
+def _record(kind: str, elapsed: float, docs: int = 0, writes: int = 0) -> None:
+    FIRESTORE_RPCS.inc(kind=kind)
+    if docs:
+        FIRESTORE_DOCS_READ.inc(docs)
+    stats = _current.get()
+    if stats is not None:
+        stats.add(
+            reads=int(kind == "read"), writes=writes if kind == "write" else 0,
+            docs=docs, seconds=elapsed,
+        )
+
+
+def _unwrap(value):
+    if isinstance(value, _Counted):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+def _counted_stream(iterator, started: float):
+    """Yield from a query stream, timing only the time spent fetching."""
+    docs = 0
+    spent = time.perf_counter() - started
+    try:
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                spent += time.perf_counter() - t
+                return
+            spent += time.perf_counter() - t
+            docs += 1
+            yield item
+    finally:
+        _record("read", spent, docs=docs)
+
+
+class _Counted:
+    """Transparent proxy around a Firestore client / reference / query / batch."""
+
+    __slots__ = ("_target", "_pending")
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_pending", 0)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return _Counted(attr) if name == "parent" and attr is not None else attr
+        return lambda *args, **kwargs: self._call(name, attr, args, kwargs)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __repr__(self):
+        return f"Counted({self._target!r})"
+
+    def _call(self, name, method, args, kwargs):
+        args, kwargs = _unwrap(args), {k: _unwrap(v) for k, v in kwargs.items()}
+        target = self._target
+
+        if name in _CHAINING:
+            return _Counted(method(*args, **kwargs))
+
+        is_batch = hasattr(target, "commit")
+        if is_batch and name in _BATCH_OPS:
+            object.__setattr__(self, "_pending", self._pending + 1)
+            method(*args, **kwargs)
+            return self
+        if is_batch and name in ("commit", "_commit"):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _record("write", time.perf_counter() - started, writes=self._pending)
+                object.__setattr__(self, "_pending", 0)
+        if is_batch and name in ("_begin", "_rollback"):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _record("transaction", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        if name in ("stream", "get_all"):
+            return _counted_stream(iter(method(*args, **kwargs)), started)
+        if name == "get":
+            result = method(*args, **kwargs)
+            if isinstance(result, list):           # Query.get
+                _record("read", time.perf_counter() - started, docs=len(result))
+            else:                                  # DocumentReference.get
+                _record("read", time.perf_counter() - started, docs=int(getattr(result, "exists", True)))
+            return result
+        if name in _DOC_WRITES or name == "add":
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                _record("write", time.perf_counter() - started, writes=1)
+            if name == "add":
+                update_time, ref = result
+                return update_time, _Counted(ref)
+            return result
+        return method(*args, **kwargs)
+
+
+def instrument(client):
+    """Wrap a Firestore client (or a stand-in with the same API) for accounting."""
+    return _Counted(client)
@@ -0,0 +1,103 @@
+"""
+Logging setup for the `app.*` loggers.
+
+Request handlers only put records on an in-memory queue (QueueHandler);
+a background QueueListener thread formats them and writes to stdout, so
+a slow terminal or log shipper never sits in request latency. Records are
+JSON lines by default (LOG_FORMAT=text for local development), and any
+`extra={...}` fields are included as keys.
+
+Per-request detail is logged at DEBUG and hidden at the default INFO
+level. Use `truncate()` for payloads that may be large (workflow results
+can carry base64 images).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from app.core.config import LOG_LEVEL, LOG_FORMAT, LOG_PAYLOAD_MAX_CHARS
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = {k: v for k, v in vars(record).items() if k not in _RESERVED and not k.startswith("_")}
+        return f"{line} {extras}" if extras else line
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Keep `extra` fields and exception info on the record; format in the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames; render them now, off the record
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def truncate(value, limit: int = LOG_PAYLOAD_MAX_CHARS) -> str:
+    """String form of `value`, cut to `limit` characters."""
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… ({len(text) - limit} more chars)"
+
+
+def setup_logging() -> None:
+    """Route `app.*` loggers through the background queue (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        stream.setFormatter(_TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.handlers = [_DeferredQueueHandler(log_queue)]
+    app_logger.propagate = False
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
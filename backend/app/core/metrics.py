@@ -0,0 +1,194 @@
+"""
+In-process metrics in the Prometheus text exposition format (served at /metrics).
+
+Counters and histograms are updated directly by the code paths they measure;
+callback metrics read existing stats (inference cache, batcher, breaker) at
+scrape time. Everything lives in this worker's memory; with several uvicorn
+workers each one reports its own numbers.
+"""
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+# Seconds; covers a cached Firestore read up to a slow Roboflow call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items()) or ([((), 0)] if not self.labelnames else [])
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}   # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        lines = self.header()
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {entry[-1]}")
+        return lines
+
+
+class Callback(_Metric):
+    """Value(s) read at scrape time. `fn` returns a number or [(labels, number), ...]."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable, kind: str = "gauge", labels: Iterable[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        samples = value if isinstance(value, list) else [({}, value)]
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(v)}"
+            for labels, v in samples
+        ]
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def counter(name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def callback(name: str, help_text: str, fn: Callable, kind: str = "gauge", labels: Iterable[str] = ()) -> Callback:
+    return _register(Callback(name, help_text, fn, kind, labels))
+
+
+def timed(hist: Histogram, errors: Counter | None = None):
+    """Decorator: observe each call's duration in `hist`, labelled with the function name."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(function=fn.__name__)
+                raise
+            finally:
+                hist.observe(time.perf_counter() - started, function=fn.__name__)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines: list[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── HTTP ─────────────────────────────────
+HTTP_REQUEST_SECONDS = histogram(
+    "ecomap_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"),
+)
+HTTP_REQUESTS = counter(
+    "ecomap_http_requests_total", "HTTP requests by route and status code", ("method", "route", "status"),
+)
@@ -1,8 +1,28 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core import firestore_accounting, metrics
+from app.core.config import FIRESTORE_RPC_HEADER
+from app.core.logs import setup_logging
 from app.routes.api import router as api_router
+from app.services import cloudinary_service, rewards_catalog
+from app.services.inference import InferenceOverloaded
 
-app = FastAPI(title="EcoMap Cebu API", version="1.0.0")
+
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    rewards_catalog.start()
+    yield
+    rewards_catalog.stop()
+    await cloudinary_service.aclose()
+
+
+app = FastAPI(title="EcoMap Cebu API", version="1.0.0", lifespan=lifespan)
 
 # CORS – allow all origins in development
 app.add_middleware(
@@ -11,12 +31,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "X-Firestore-RPCs"],
 )
 
 # Include API routes
 app.include_router(api_router)
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Latency histogram, request counter and Firestore RPC totals per route template."""
+    started = time.perf_counter()
+    rpc_stats, token = firestore_accounting.start_request()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if FIRESTORE_RPC_HEADER:
+            response.headers["X-Firestore-RPCs"] = rpc_stats.header_value()
+        return response
+    finally:
+        firestore_accounting.end_request(token)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, route=path)
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=path, status=status)
+        firestore_accounting.observe_request(path, rpc_stats)
+
+
+@app.exception_handler(InferenceOverloaded)
+async def inference_overloaded(request: Request, exc: InferenceOverloaded):
+    """Shed load fast so the mobile client can retry instead of timing out."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.get("/")
 def root():
     return {"message": "EcoMap Cebu API is running 🚀"}
@@ -24,4 +76,10 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -137,6 +137,17 @@ class ReportOut(BaseModel):
     created_at: Optional[str] = None
 
 
+class HeatmapCell(BaseModel):
+    lat: float
+    lng: float
+    weight: float   # sum of severity weights of the reports in this cell
+    count: int
+
+class HeatmapOut(BaseModel):
+    zoom: int
+    cells: list[HeatmapCell]
+
+
 # ──────────────────────────────────────
 # TrashCare Jobs
 # ──────────────────────────────────────
@@ -239,6 +250,8 @@ class RewardUpdate(BaseModel):
     description: Optional[str] = None
     points_required: Optional[int] = None
     stock: Optional[int] = None
+    # split stock over N counters for hot rewards (0 = off; max firebase_service.MAX_STOCK_SHARDS)
+    stock_shards: Optional[int] = Field(None, ge=0, le=200)
     icon: Optional[str] = None
     partner_name: Optional[str] = None
 
@@ -321,6 +334,10 @@ class DetectionResult(BaseModel):
     image_width: int = 0
     image_height: int = 0
 
+class ScanResult(DetectionResult):
+    analysis: AIAnalysisResult
+    image_url: str = ""  # Cloudinary URL of the uploaded photo ("" if the upload failed)
+
 
 # ──────────────────────────────────────
 # Partner Products
@@ -343,6 +360,8 @@ class ProductUpdate(BaseModel):
     points_price: Optional[int] = None
     category: Optional[str] = None
     stock: Optional[int] = None
+    # split stock over N counters for hot products (0 = off; max firebase_service.MAX_STOCK_SHARDS)
+    stock_shards: Optional[int] = Field(None, ge=0, le=200)
     image_url: Optional[str] = None
 
 class ProductOut(BaseModel):
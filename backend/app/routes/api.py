@@ -1,25 +1,80 @@
 """
 EcoMap API routes – all REST endpoints for the mobile app.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Body
+import asyncio
+import logging
+import math
+from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Request, Response
 from app.models.schemas import (
     UserCreate, UserUpdate, UserOut, UserRoleUpdate,
-    ReportCreate, ReportOut,
+    ReportCreate, ReportOut, HeatmapOut,
     JobCreate, JobOut, JobApplicationCreate, JobApplicationOut, JobApprovalUpdate,
     RewardOut, RewardCreate, RewardUpdate, RedemptionCreate, RedemptionOut,
-    EcoPointsOut, AIAnalysisResult, DetectionResult,
+    EcoPointsOut, AIAnalysisResult, DetectionResult, ScanResult,
     CleanupVerifyRequest, CleanupVerifyResult,
     ProductCreate, ProductUpdate, ProductOut,
     DashboardStats,
     TokenPurchaseCreate, TokenPurchaseOut, ConvertPointsRequest,
 )
-from app.services import firebase_service as fs
-from app.services.cloudinary_service import upload_image
-from app.services.inference import analyze_image, detect_objects, verify_cleanup
+from app.services import firebase_async as fs, rewards_catalog
+from app.services.cloudinary_service import upload_image_async, delete_image_async, get_stats as upload_stats
+from app.services.firebase_service import get_user_cache_stats
+from app.services.inference import (
+    analyze_image, detect_objects, verify_cleanup, scan_image, check_admission, get_stats as inference_stats,
+)
+from app.services.heatmap import get_heatmap
+from app.services.image_handle import ImageHandle
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 
 
+# ──────────────────────────────────────
+# BINARY IMAGE UPLOADS
+# ──────────────────────────────────────
+
+# OpenAPI description for endpoints that read the image straight from the request
+IMAGE_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                },
+            },
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+            "image/jpeg": {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+}
+
+
+async def read_image_upload(request: Request) -> ImageHandle:
+    """Read raw image bytes from a multipart `file` field or the request body itself."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'file' field")
+        data = await upload.read()
+    else:
+        data = bytearray()
+        async for chunk in request.stream():
+            data.extend(chunk)
+        data = bytes(data)
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image")
+    try:
+        return ImageHandle(data)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Body is not a valid image")
+
+
 # ──────────────────────────────────────
 # AUTH / USERS
 # ──────────────────────────────────────
@@ -27,16 +82,16 @@ router = APIRouter(prefix="/api")
 @router.post("/auth/register", response_model=UserOut)
 async def register_user(data: UserCreate):
     """Create a new user document in Firestore after Firebase Auth signup on client."""
-    existing = fs.get_user(data.uid)
+    existing = await fs.get_user(data.uid)
     if existing:
         return existing
-    user = fs.create_user(data.model_dump())
+    user = await fs.create_user(data.model_dump())
     return user
 
 
 @router.get("/users/{uid}", response_model=UserOut)
 async def get_user(uid: str):
-    user = fs.get_user(uid)
+    user = await fs.get_user(uid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -44,7 +99,7 @@ async def get_user(uid: str):
 
 @router.put("/users/{uid}", response_model=UserOut)
 async def update_user(uid: str, data: UserUpdate):
-    user = fs.update_user(uid, data.model_dump())
+    user = await fs.update_user(uid, data.model_dump())
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -58,30 +113,75 @@ async def update_user(uid: str, data: UserUpdate):
 async def create_report(data: ReportCreate):
     # Enforce cooldown: per-user (4h) + area proximity (10m / 4h)
     try:
-        cooldown_msg = fs.check_report_cooldown(data.user_id, data.geo_lat, data.geo_lng)
+        cooldown_msg = await fs.check_report_cooldown(data.user_id, data.geo_lat, data.geo_lng)
         if cooldown_msg:
             raise HTTPException(status_code=429, detail=cooldown_msg)
     except HTTPException:
         raise
     except Exception as e:
         # If cooldown check fails (e.g. missing Firestore index), log and allow
-        print(f"[Cooldown check error, allowing report] {e}")
-    report = fs.create_report(data.model_dump())
-    return report
+        logger.warning("Cooldown check failed, allowing report: %s", e)
+    try:
+        return await fs.create_report(data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def _parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    """Parse `bbox=min_lat,min_lng,max_lat,max_lng` (south, west, north, east)."""
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'min_lat,min_lng,max_lat,max_lng'")
+    if not all(math.isfinite(v) for v in (min_lat, min_lng, max_lat, max_lng)):
+        raise HTTPException(status_code=400, detail="bbox values must be finite numbers")
+    if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise HTTPException(status_code=400, detail="bbox latitudes must be within ±90 and longitudes within ±180")
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="bbox minimums must not exceed maximums")
+    return min_lat, min_lng, max_lat, max_lng
 
 
 @router.get("/reports", response_model=list[ReportOut])
 async def list_reports(
+    response: Response,
     waste_type: str | None = None,
     severity: str | None = None,
     limit: int = 50,
+    bbox: str | None = None,
+    cursor: str | None = None,
 ):
-    return fs.get_reports(waste_type=waste_type, severity=severity, limit=limit)
+    """Newest reports, or only those inside `bbox=min_lat,min_lng,max_lat,max_lng`.
+
+    Without `bbox`, the next page's cursor is returned in the X-Next-Cursor
+    header; pass it back as `cursor` to continue.
+    """
+    if bbox:
+        return await fs.get_reports_in_bbox(*_parse_bbox(bbox), waste_type=waste_type, severity=severity, limit=limit)
+    try:
+        reports, next_cursor = await fs.get_reports_page(
+            waste_type=waste_type, severity=severity, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return reports
+
+
+@router.get("/reports/heatmap", response_model=HeatmapOut)
+async def report_heatmap(bbox: str, zoom: int = 12, waste_type: str | None = None):
+    """Pre-aggregated, severity-weighted heatmap cells for the visible map area.
+    Large areas are binned at a lower zoom, returned as `zoom`."""
+    try:
+        return await fs.run_blocking(get_heatmap, *_parse_bbox(bbox), zoom=zoom, waste_type=waste_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/reports/{report_id}", response_model=ReportOut)
 async def get_report(report_id: str):
-    report = fs.get_report(report_id)
+    report = await fs.get_report(report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     return report
@@ -89,23 +189,24 @@ async def get_report(report_id: str):
 
 @router.get("/users/{uid}/reports", response_model=list[ReportOut])
 async def get_user_reports(uid: str, limit: int = 20):
-    return fs.get_user_reports(uid, limit=limit)
+    return await fs.get_user_reports(uid, limit=limit)
 
 
 # ──────────────────────────────────────
 # CLEANUP VERIFICATION
 # ──────────────────────────────────────
 
-@router.post("/reports/{report_id}/cleanup", response_model=CleanupVerifyResult)
-async def verify_and_cleanup(report_id: str, data: CleanupVerifyRequest):
+async def _verify_and_cleanup(report_id: str, user_id: str, image: ImageHandle) -> CleanupVerifyResult:
     """
-    Accept a cleanup photo, run AI verification, and if the area looks
+    Run AI verification on a cleanup photo, and if the area looks
     clean mark the report as cleaned + award points.
     """
-    # 1. Verify the report exists
-    report = fs.get_report(report_id)
+    # 1. Verify the report and user exist (before any inference or upload)
+    report, user = await asyncio.gather(fs.get_report(report_id), fs.get_user(user_id))
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     if report.get("status") == "cleaned":
         return CleanupVerifyResult(
             success=False, waste_detected=0,
@@ -113,7 +214,7 @@ async def verify_and_cleanup(report_id: str, data: CleanupVerifyRequest):
         )
 
     # 2. Run AI cleanup verification
-    result = await verify_cleanup(data.image_base64)
+    result = await verify_cleanup(image)
 
     if not result["verified"]:
         return CleanupVerifyResult(
@@ -122,15 +223,16 @@ async def verify_and_cleanup(report_id: str, data: CleanupVerifyRequest):
             message=result["message"],
         )
 
-    # 3. Upload cleanup photo to Cloudinary
-    import base64
-    img_bytes = base64.b64decode(data.image_base64)
-    cleanup_url = upload_image(img_bytes)
+    # 3. Upload cleanup photo to Cloudinary (same decoded bytes)
+    cleanup_url = await upload_image_async(image.data)
     if not cleanup_url:
         cleanup_url = ""
 
     # 4. Mark report as cleaned + award points
-    fs.mark_report_cleaned(report_id, data.user_id, cleanup_url)
+    try:
+        await fs.mark_report_cleaned(report_id, user_id, cleanup_url)
+    except ValueError as e:  # user deleted since step 1
+        raise HTTPException(status_code=404, detail=str(e))
 
     return CleanupVerifyResult(
         success=True,
@@ -141,19 +243,40 @@ async def verify_and_cleanup(report_id: str, data: CleanupVerifyRequest):
     )
 
 
+@router.post("/reports/{report_id}/cleanup", response_model=CleanupVerifyResult)
+async def verify_and_cleanup(report_id: str, data: CleanupVerifyRequest):
+    """Cleanup verification with the photo as base64 inside a JSON body."""
+    try:
+        image = ImageHandle.from_base64(data.image_base64)
+    except Exception:
+        raise HTTPException(status_code=400, detail="image_base64 is not a valid image")
+    return await _verify_and_cleanup(report_id, data.user_id, image)
+
+
+@router.post(
+    "/reports/{report_id}/cleanup/upload",
+    response_model=CleanupVerifyResult,
+    openapi_extra=IMAGE_UPLOAD_BODY,
+)
+async def verify_and_cleanup_upload(report_id: str, user_id: str, request: Request):
+    """Cleanup verification with the raw photo as multipart `file` or an octet-stream body."""
+    image = await read_image_upload(request)
+    return await _verify_and_cleanup(report_id, user_id, image)
+
+
 # ──────────────────────────────────────
 # TRASHCARE JOBS
 # ──────────────────────────────────────
 
 @router.get("/jobs", response_model=list[JobOut])
 async def list_jobs(limit: int = 50):
-    return fs.get_jobs(limit=limit)
+    return await fs.get_jobs(limit=limit)
 
 
 @router.post("/jobs", response_model=JobOut)
 async def create_job(data: JobCreate):
     try:
-        return fs.create_job(data.model_dump())
+        return await fs.create_job(data.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -161,7 +284,7 @@ async def create_job(data: JobCreate):
 @router.post("/jobs/{job_id}/apply", response_model=JobApplicationOut)
 async def apply_to_job(job_id: str, data: JobApplicationCreate):
     data.job_id = job_id
-    return fs.apply_to_job(data.model_dump())
+    return await fs.apply_to_job(data.model_dump())
 
 
 # ──────────────────────────────────────
@@ -170,17 +293,21 @@ async def apply_to_job(job_id: str, data: JobApplicationCreate):
 
 @router.get("/rewards", response_model=list[RewardOut])
 async def list_rewards():
-    return fs.get_rewards()
+    # Served from the listener-fed catalog; Firestore only until it has synced
+    rewards = rewards_catalog.get_rewards()
+    if rewards is None:
+        rewards = await fs.get_rewards()
+    return rewards
 
 
 @router.post("/rewards", response_model=RewardOut)
 async def create_reward(data: RewardCreate):
-    return fs.create_reward(data.model_dump())
+    return await fs.create_reward(data.model_dump())
 
 
 @router.put("/rewards/{reward_id}", response_model=RewardOut)
 async def update_reward_endpoint(reward_id: str, data: RewardUpdate):
-    result = fs.update_reward(reward_id, data.model_dump(exclude_none=True))
+    result = await fs.update_reward(reward_id, data.model_dump(exclude_none=True))
     if not result:
         raise HTTPException(status_code=404, detail="Reward not found")
     return result
@@ -188,14 +315,14 @@ async def update_reward_endpoint(reward_id: str, data: RewardUpdate):
 
 @router.delete("/rewards/{reward_id}")
 async def delete_reward_endpoint(reward_id: str):
-    if not fs.delete_reward(reward_id):
+    if not await fs.delete_reward(reward_id):
         raise HTTPException(status_code=404, detail="Reward not found")
     return {"ok": True}
 
 
 @router.post("/rewards/redeem", response_model=RedemptionOut)
 async def redeem_reward(data: RedemptionCreate):
-    result = fs.redeem_reward(data.user_id, data.reward_id)
+    result = await fs.redeem_reward(data.user_id, data.reward_id)
     if not result:
         raise HTTPException(status_code=400, detail="Cannot redeem. Check points balance or reward availability.")
     return result
@@ -207,7 +334,7 @@ async def redeem_reward(data: RedemptionCreate):
 
 @router.get("/users/{uid}/points", response_model=list[EcoPointsOut])
 async def get_user_points(uid: str):
-    return fs.get_user_points_history(uid)
+    return await fs.get_user_points_history(uid)
 
 
 # ──────────────────────────────────────
@@ -217,7 +344,7 @@ async def get_user_points(uid: str):
 @router.post("/upload/image")
 async def upload_image_endpoint(file: UploadFile = File(...)):
     contents = await file.read()
-    url = upload_image(contents)
+    url = await upload_image_async(contents)
     if not url:
         raise HTTPException(status_code=500, detail="Image upload failed")
     return {"url": url}
@@ -241,13 +368,77 @@ async def detect_waste(image_base64: str = Body(..., embed=True)):
     return result
 
 
+@router.post("/analyze/upload", response_model=AIAnalysisResult, openapi_extra=IMAGE_UPLOAD_BODY)
+async def analyze_waste_upload(request: Request):
+    """Like /analyze, but the raw image is sent as multipart `file` or an octet-stream body."""
+    return await analyze_image(await read_image_upload(request))
+
+
+@router.post("/detect/upload", response_model=DetectionResult, openapi_extra=IMAGE_UPLOAD_BODY)
+async def detect_waste_upload(request: Request):
+    """Like /detect, but the raw image is sent as multipart `file` or an octet-stream body."""
+    return await detect_objects(await read_image_upload(request))
+
+
+@router.post("/scan", response_model=ScanResult, openapi_extra=IMAGE_UPLOAD_BODY)
+async def scan_waste(request: Request):
+    """
+    One-shot scan: the photo is sent once (multipart `file` or octet-stream),
+    then detection and the Cloudinary upload run concurrently. Returns the
+    boxes, the /analyze-style summary and the uploaded image URL together.
+    A scan shed with 503 uploads nothing: a full queue is refused before the
+    upload starts, and a later failure cancels (or deletes) the upload.
+    """
+    image = await read_image_upload(request)
+    check_admission(image)
+
+    async def _upload() -> str:
+        try:
+            return await upload_image_async(image.data)
+        except Exception as e:
+            logger.warning("Scan upload failed: %s", e)
+            return ""
+
+    upload = asyncio.ensure_future(_upload())
+    try:
+        result = await scan_image(image)
+    except BaseException:
+        upload.cancel()
+        await asyncio.wait([upload])
+        if not upload.cancelled() and upload.result():
+            try:
+                await delete_image_async(upload.result())
+            except Exception as e:
+                logger.warning("Could not delete upload of failed scan: %s", e)
+        raise
+    return {**result, "image_url": await upload}
+
+
+@router.get("/inference/stats")
+async def get_inference_stats():
+    """Detection cache hit/miss counters, in-flight Roboflow calls, queue depth and batching stats."""
+    return inference_stats()
+
+
+@router.get("/upload/stats")
+async def get_upload_stats():
+    """Cloudinary upload counts and timings for this worker."""
+    return upload_stats()
+
+
+@router.get("/user-cache/stats")
+async def get_user_cache_stats_endpoint():
+    """User document cache size and hit rate for this worker."""
+    return get_user_cache_stats()
+
+
 # ──────────────────────────────────────
 # DASHBOARD
 # ──────────────────────────────────────
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats():
-    return fs.get_dashboard_stats()
+    return await fs.get_dashboard_stats()
 
 
 # ──────────────────────────────────────
@@ -256,14 +447,14 @@ async def get_dashboard_stats():
 
 @router.get("/admin/users", response_model=list[UserOut])
 async def list_all_users():
-    return fs.get_all_users()
+    return await fs.get_all_users()
 
 
 @router.put("/admin/users/{uid}/role", response_model=UserOut)
 async def update_user_role(uid: str, data: UserRoleUpdate):
     if data.role not in ("user", "partner", "admin"):
         raise HTTPException(status_code=400, detail="Invalid role")
-    user = fs.update_user_role(uid, data.role)
+    user = await fs.update_user_role(uid, data.role)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -275,12 +466,12 @@ async def update_user_role(uid: str, data: UserRoleUpdate):
 
 @router.get("/admin/jobs/pending", response_model=list[JobOut])
 async def list_pending_jobs():
-    return fs.get_pending_jobs()
+    return await fs.get_pending_jobs()
 
 
 @router.put("/admin/jobs/{job_id}/approve", response_model=JobOut)
 async def approve_job(job_id: str, data: JobApprovalUpdate):
-    result = fs.approve_job(job_id, data.reviewer_id, data.note)
+    result = await fs.approve_job(job_id, data.reviewer_id, data.note)
     if not result:
         raise HTTPException(status_code=404, detail="Job not found")
     return result
@@ -288,7 +479,7 @@ async def approve_job(job_id: str, data: JobApprovalUpdate):
 
 @router.put("/admin/jobs/{job_id}/reject", response_model=JobOut)
 async def reject_job(job_id: str, data: JobApprovalUpdate):
-    result = fs.reject_job(job_id, data.reviewer_id, data.note)
+    result = await fs.reject_job(job_id, data.reviewer_id, data.note)
     if not result:
         raise HTTPException(status_code=404, detail="Job not found")
     return result
@@ -301,7 +492,7 @@ async def reject_job(job_id: str, data: JobApprovalUpdate):
 @router.post("/tokens/purchase", response_model=TokenPurchaseOut)
 async def purchase_tokens(data: TokenPurchaseCreate):
     try:
-        return fs.purchase_tokens(data.user_id, data.amount, data.php_amount)
+        return await fs.purchase_tokens(data.user_id, data.amount, data.php_amount)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -309,14 +500,14 @@ async def purchase_tokens(data: TokenPurchaseCreate):
 @router.post("/tokens/convert-points")
 async def convert_points_to_credits(data: ConvertPointsRequest):
     try:
-        return fs.convert_points_to_credits(data.user_id, data.points_to_convert)
+        return await fs.convert_points_to_credits(data.user_id, data.points_to_convert)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/users/{uid}/tokens", response_model=list[TokenPurchaseOut])
 async def get_user_tokens(uid: str):
-    return fs.get_token_transactions(uid)
+    return await fs.get_token_transactions(uid)
 
 
 # ──────────────────────────────────────
@@ -325,17 +516,17 @@ async def get_user_tokens(uid: str):
 
 @router.get("/products", response_model=list[ProductOut])
 async def list_products(partner_id: str | None = None):
-    return fs.get_products(partner_id=partner_id)
+    return await fs.get_products(partner_id=partner_id)
 
 
 @router.post("/products", response_model=ProductOut)
 async def create_product(data: ProductCreate):
-    return fs.create_product(data.model_dump())
+    return await fs.create_product(data.model_dump())
 
 
 @router.put("/products/{product_id}", response_model=ProductOut)
 async def update_product(product_id: str, data: ProductUpdate):
-    result = fs.update_product(product_id, data.model_dump())
+    result = await fs.update_product(product_id, data.model_dump())
     if not result:
         raise HTTPException(status_code=404, detail="Product not found")
     return result
@@ -343,7 +534,7 @@ async def update_product(product_id: str, data: ProductUpdate):
 
 @router.delete("/products/{product_id}")
 async def delete_product(product_id: str):
-    ok = fs.delete_product(product_id)
+    ok = await fs.delete_product(product_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Product not found")
     return {"deleted": True}
@@ -0,0 +1,83 @@
+"""
+Circuit breaker for calls to an upstream service (Roboflow).
+
+closed     → calls go through; `failure_threshold` consecutive failures open it
+open       → calls fail immediately with CircuitOpen for `reset_timeout` seconds
+half_open  → one probe call is let through; success closes, failure re-opens
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Upstream is considered down; the call was not attempted."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.successes = 0
+        self.failures = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen unless a call may be attempted now."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.short_circuited += 1
+                raise CircuitOpen(f"{self.name} circuit is open")
+            self.state = HALF_OPEN
+            logger.info("Circuit %s half-open, sending probe", self.name)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.short_circuited += 1
+                raise CircuitOpen(f"{self.name} circuit is half-open, probe in flight")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != CLOSED:
+            logger.info("Circuit %s closed", self.name)
+        self.state = CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+                logger.warning("Circuit %s opened after %d failure(s)", self.name, self.consecutive_failures)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """The attempted call ended without a verdict (e.g. shed by admission control)."""
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
@@ -1,15 +1,167 @@
 """
 Cloudinary image upload service.
+
+Uploads go straight to Cloudinary's signed upload API over pooled keep-alive
+connections, so the TLS handshake is paid once per worker instead of once
+per photo. `upload_image_async` is for the route handlers (bounded by
+CLOUDINARY_MAX_CONCURRENT_UPLOADS); `upload_image` is the blocking variant
+for scripts. `delete_image_async` removes an upload whose request failed
+after all.
 """
-import cloudinary.uploader
+import asyncio
+import logging
+import re
+import threading
+import time
+import httpx
+import cloudinary.utils
+from app.core import metrics
 from app.core.config import cloudinary  # noqa – ensures cloudinary is configured
+from app.core.config import CLOUDINARY_MAX_CONCURRENT_UPLOADS, CLOUDINARY_UPLOAD_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_LIMITS = httpx.Limits(
+    max_connections=CLOUDINARY_MAX_CONCURRENT_UPLOADS,
+    max_keepalive_connections=CLOUDINARY_MAX_CONCURRENT_UPLOADS,
+)
+
+_sync_client: httpx.Client | None = None
+_sync_lock = threading.Lock()
+
+# httpx.AsyncClient and the semaphore are tied to the event loop that created them
+_async_client: httpx.AsyncClient | None = None
+_async_loop: asyncio.AbstractEventLoop | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+UPLOAD_SECONDS = metrics.histogram(
+    "ecomap_cloudinary_upload_duration_seconds", "Cloudinary upload latency", ("outcome",),
+)
+UPLOAD_BYTES = metrics.counter("ecomap_cloudinary_upload_bytes_total", "Bytes uploaded to Cloudinary")
+
+_stats_lock = threading.Lock()
+_stats = {
+    "uploads": 0,
+    "failures": 0,
+    "deleted": 0,
+    "bytes": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0,
+}
+
+
+def _signed_request(folder: str) -> tuple[str, dict]:
+    """Upload URL and signed form fields for one upload."""
+    params = cloudinary.utils.sign_request({"timestamp": cloudinary.utils.now(), "folder": folder}, {})
+    return cloudinary.utils.cloudinary_api_url("upload", resource_type="image"), params
+
+
+def _record(size: int, seconds: float, ok: bool) -> None:
+    UPLOAD_SECONDS.observe(seconds, outcome="ok" if ok else "error")
+    if ok:
+        UPLOAD_BYTES.inc(size)
+    with _stats_lock:
+        if ok:
+            _stats["uploads"] += 1
+            _stats["bytes"] += size
+        else:
+            _stats["failures"] += 1
+        _stats["total_seconds"] += seconds
+        _stats["max_seconds"] = max(_stats["max_seconds"], seconds)
+    logger.log(
+        logging.DEBUG if ok else logging.WARNING,
+        "Cloudinary upload %s", "done" if ok else "failed",
+        extra={"bytes": size, "ms": round(seconds * 1000, 1)},
+    )
+
+
+def _secure_url(response: httpx.Response) -> str:
+    response.raise_for_status()
+    return response.json().get("secure_url", "")
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(limits=_LIMITS, timeout=CLOUDINARY_UPLOAD_TIMEOUT)
+        return _sync_client
+
+
+def _get_async_client() -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    global _async_client, _async_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        _async_client = httpx.AsyncClient(limits=_LIMITS, timeout=CLOUDINARY_UPLOAD_TIMEOUT)
+        _semaphore = asyncio.Semaphore(CLOUDINARY_MAX_CONCURRENT_UPLOADS)
+        _async_loop = loop
+    return _async_client, _semaphore
 
 
 def upload_image(file_bytes: bytes, folder: str = "ecomap_reports") -> str:
-    """Upload image bytes to Cloudinary and return the secure URL."""
-    result = cloudinary.uploader.upload(
-        file_bytes,
-        folder=folder,
-        resource_type="image",
+    """Upload image bytes to Cloudinary and return the secure URL (blocking)."""
+    url, params = _signed_request(folder)
+    started = time.perf_counter()
+    try:
+        response = _get_sync_client().post(url, data=params, files={"file": ("upload", file_bytes)})
+        secure_url = _secure_url(response)
+    except Exception:
+        _record(len(file_bytes), time.perf_counter() - started, ok=False)
+        raise
+    _record(len(file_bytes), time.perf_counter() - started, ok=True)
+    return secure_url
+
+
+async def upload_image_async(file_bytes: bytes, folder: str = "ecomap_reports") -> str:
+    """Upload image bytes to Cloudinary without blocking the event loop."""
+    client, semaphore = _get_async_client()
+    async with semaphore:
+        url, params = _signed_request(folder)
+        started = time.perf_counter()
+        try:
+            response = await client.post(url, data=params, files={"file": ("upload", file_bytes)})
+            secure_url = _secure_url(response)
+        except Exception:
+            _record(len(file_bytes), time.perf_counter() - started, ok=False)
+            raise
+    _record(len(file_bytes), time.perf_counter() - started, ok=True)
+    return secure_url
+
+
+# …/image/upload/[v<version>/]<public_id>.<ext>, as returned for our uploads
+_PUBLIC_ID = re.compile(r"/image/upload/(?:v\d+/)?(.+?)(?:\.[^./]+)?$")
+
+
+async def delete_image_async(image_url: str) -> None:
+    """Delete an image uploaded by upload_image_async, given its secure URL."""
+    match = _PUBLIC_ID.search(image_url)
+    if match is None:
+        raise ValueError(f"Not a Cloudinary upload URL: {image_url}")
+    params = cloudinary.utils.sign_request(
+        {"timestamp": cloudinary.utils.now(), "public_id": match.group(1)}, {},
     )
-    return result.get("secure_url", "")
+    client, _ = _get_async_client()
+    response = await client.post(cloudinary.utils.cloudinary_api_url("destroy", resource_type="image"), data=params)
+    response.raise_for_status()
+    with _stats_lock:
+        _stats["deleted"] += 1
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    done = stats["uploads"] + stats["failures"]
+    stats["avg_seconds"] = round(stats["total_seconds"] / done, 4) if done else 0.0
+    return stats
+
+
+async def aclose() -> None:
+    """Close pooled connections (called on app shutdown)."""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
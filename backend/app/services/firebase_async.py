@@ -0,0 +1,81 @@
+"""
+Async access to firebase_service for the route handlers.
+
+The Firestore client is synchronous, so every call runs on a dedicated,
+bounded thread pool. A slow stream then only occupies one of those threads
+instead of freezing the event loop, and it never competes with inference
+for asyncio's default executor.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import FIRESTORE_MAX_WORKERS
+from app.services import firebase_service as fs
+
+_executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking Firestore-bound callable on the Firestore thread pool."""
+    loop = asyncio.get_running_loop()
+    # Carry the request context (RPC accounting) into the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def _in_executor(name: str):
+    """Async version of `firebase_service.<name>` (looked up at call time)."""
+    @functools.wraps(getattr(fs, name))
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(getattr(fs, name), *args, **kwargs)
+    return wrapper
+
+
+# Users
+create_user = _in_executor("create_user")
+get_user = _in_executor("get_user")
+update_user = _in_executor("update_user")
+
+# Reports
+check_report_cooldown = _in_executor("check_report_cooldown")
+create_report = _in_executor("create_report")
+get_reports_page = _in_executor("get_reports_page")
+get_reports_in_bbox = _in_executor("get_reports_in_bbox")
+get_report = _in_executor("get_report")
+get_user_reports = _in_executor("get_user_reports")
+mark_report_cleaned = _in_executor("mark_report_cleaned")
+
+# TrashCare jobs
+create_job = _in_executor("create_job")
+get_jobs = _in_executor("get_jobs")
+get_pending_jobs = _in_executor("get_pending_jobs")
+approve_job = _in_executor("approve_job")
+reject_job = _in_executor("reject_job")
+apply_to_job = _in_executor("apply_to_job")
+
+# Rewards & redemptions
+get_rewards = _in_executor("get_rewards")
+create_reward = _in_executor("create_reward")
+update_reward = _in_executor("update_reward")
+delete_reward = _in_executor("delete_reward")
+redeem_reward = _in_executor("redeem_reward")
+
+# Eco-points, tokens & credits
+get_user_points_history = _in_executor("get_user_points_history")
+purchase_tokens = _in_executor("purchase_tokens")
+convert_points_to_credits = _in_executor("convert_points_to_credits")
+get_token_transactions = _in_executor("get_token_transactions")
+
+# User role management
+get_all_users = _in_executor("get_all_users")
+update_user_role = _in_executor("update_user_role")
+
+# Partner products
+create_product = _in_executor("create_product")
+get_products = _in_executor("get_products")
+update_product = _in_executor("update_product")
+delete_product = _in_executor("delete_product")
+
+# Dashboard
+get_dashboard_stats = _in_executor("get_dashboard_stats")
@@ -1,11 +1,32 @@
 """
 Firestore CRUD operations for all EcoMap collections.
 """
-import math
+import base64
+import json
+import random
 import uuid
 from datetime import datetime, timezone, timedelta
-from google.cloud.firestore_v1 import FieldFilter
-from app.core.config import db, REPORT_COOLDOWN_HOURS, REPORT_RADIUS_METERS
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import FieldFilter, Increment, transactional
+from app.core import metrics
+from app.core.config import (
+    db, REPORT_COOLDOWN_HOURS, REPORT_RADIUS_METERS, USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS,
+)
+from app.services import geo
+from app.services.user_cache import UserCache
+
+# Every public function below is timed (served at /metrics)
+FIRESTORE_CALL_SECONDS = metrics.histogram(
+    "ecomap_firestore_call_duration_seconds", "Time spent in firebase_service functions", ("function",),
+)
+FIRESTORE_CALL_ERRORS = metrics.counter(
+    "ecomap_firestore_call_errors_total", "firebase_service calls that raised", ("function",),
+)
+_timed = metrics.timed(FIRESTORE_CALL_SECONDS, FIRESTORE_CALL_ERRORS)
+
+# User documents served by get_user(). Every write below that touches a user
+# document passes the same fields to _users.update() after it commits.
+_users = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
 
 
 def _now() -> str:
@@ -20,6 +41,7 @@ def _new_id() -> str:
 # USERS
 # ──────────────────────────────────────
 
+@_timed
 def create_user(data: dict) -> dict:
     uid = data["uid"]
     doc = {
@@ -36,23 +58,50 @@ def create_user(data: dict) -> dict:
         "credits_balance": 15,  # all users get 15 free credits
         "created_at": _now(),
     }
-    db.collection("users").document(uid).set(doc)
+    batch = db.batch()
+    batch.set(db.collection("users").document(uid), doc)
+    _bump_counters(batch, total_users=1)
+    batch.commit()
+    _users.put(uid, doc)
     return doc
 
 
+@_timed
 def get_user(uid: str) -> dict | None:
+    cached = _users.get(uid)
+    if cached is not None:
+        return cached
+    epoch = _users.begin_fill()
     snap = db.collection("users").document(uid).get()
     if snap.exists:
-        return snap.to_dict()
+        doc = snap.to_dict()
+        _users.fill(uid, doc, epoch)
+        return doc
     return None
 
 
+def get_user_cache_stats() -> dict:
+    return _users.stats()
+
+
+# Scrape-time views of the user cache for /metrics
+metrics.callback(
+    "ecomap_user_cache_lookups_total", "get_user lookups by cache result",
+    lambda: [({"result": r}, _users.stats()[r]) for r in ("hits", "misses")],
+    kind="counter", labels=("result",),
+)
+metrics.callback("ecomap_user_cache_hit_ratio", "Share of get_user lookups served from cache", lambda: _users.stats()["hit_rate"])
+metrics.callback("ecomap_user_cache_entries", "User documents cached in this worker", lambda: _users.stats()["entries"])
+
+
+@_timed
 def update_user(uid: str, updates: dict) -> dict | None:
     ref = db.collection("users").document(uid)
     # filter out None values
     clean = {k: v for k, v in updates.items() if v is not None}
     if clean:
         ref.update(clean)
+        _users.update(uid, clean)
     return get_user(uid)
 
 
@@ -60,16 +109,34 @@ def update_user(uid: str, updates: dict) -> dict | None:
 # REPORT COOLDOWN CHECKS
 # ──────────────────────────────────────
 
-def _haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    """Haversine distance in meters between two lat/lng points."""
-    R = 6_371_000
-    to_rad = lambda d: d * math.pi / 180
-    dLat = to_rad(lat2 - lat1)
-    dLng = to_rad(lng2 - lng1)
-    a = math.sin(dLat / 2) ** 2 + math.cos(to_rad(lat1)) * math.cos(to_rad(lat2)) * math.sin(dLng / 2) ** 2
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+# Grid of reports created inside the cooldown window, keyed by geohash cell.
+# Synced incrementally from Firestore so reports written by other workers
+# are seen too; only documents newer than the last sync are fetched.
+_recent_reports = geo.RecentReportIndex(geo.precision_for_radius(REPORT_RADIUS_METERS))
+
+# Re-read this far behind the last sync to cover clock skew between workers.
+_INDEX_SYNC_OVERLAP = timedelta(seconds=30)
 
 
+def _sync_recent_reports(cutoff: str) -> None:
+    """Pull reports created since the last sync into the in-process grid index."""
+    started = datetime.now(timezone.utc)
+    since = cutoff
+    if _recent_reports.synced_at:
+        since = max(cutoff, (_recent_reports.synced_at - _INDEX_SYNC_OVERLAP).isoformat())
+    docs = (
+        db.collection("reports")
+        .where(filter=FieldFilter("created_at", ">=", since))
+        .select(["report_id", "geo_lat", "geo_lng", "geohash", "created_at"])
+        .stream()
+    )
+    for d in docs:
+        _recent_reports.add(d.to_dict())
+    _recent_reports.synced_at = started
+    _recent_reports.prune(cutoff)
+
+
+@_timed
 def check_report_cooldown(user_id: str, geo_lat: float, geo_lng: float) -> str | None:
     """Return an error message if the user or area is still on cooldown, else None."""
     cutoff = (datetime.now(timezone.utc) - timedelta(hours=REPORT_COOLDOWN_HOURS)).isoformat()
@@ -85,18 +152,12 @@ def check_report_cooldown(user_id: str, geo_lat: float, geo_lng: float) -> str |
     if any(True for _ in user_recent):
         return f"You can only submit a report once every {int(REPORT_COOLDOWN_HOURS)} hour(s). Please wait before submitting again."
 
-    # 2. Area-based cooldown – any report within REPORT_RADIUS_METERS in the last N hours
-    #    Firestore can't do geo queries, so fetch recent reports and check distance.
-    recent_docs = (
-        db.collection("reports")
-        .where(filter=FieldFilter("created_at", ">=", cutoff))
-        .stream()
-    )
-    for d in recent_docs:
-        r = d.to_dict()
-        dist = _haversine_meters(geo_lat, geo_lng, r.get("geo_lat", 0), r.get("geo_lng", 0))
-        if dist <= REPORT_RADIUS_METERS:
-            return f"A report already exists within {int(REPORT_RADIUS_METERS)}m of this location in the last {int(REPORT_COOLDOWN_HOURS)} hour(s). Please wait or move to a different area."
+    # 2. Area-based cooldown – any report within REPORT_RADIUS_METERS in the last N hours.
+    #    Only the grid cells around the point are checked, so the cost does not
+    #    grow with the number of recent reports elsewhere in the province.
+    _sync_recent_reports(cutoff)
+    if _recent_reports.find_near(geo_lat, geo_lng, REPORT_RADIUS_METERS, since=cutoff):
+        return f"A report already exists within {int(REPORT_RADIUS_METERS)}m of this location in the last {int(REPORT_COOLDOWN_HOURS)} hour(s). Please wait or move to a different area."
 
     return None
 
@@ -105,7 +166,15 @@ def check_report_cooldown(user_id: str, geo_lat: float, geo_lng: float) -> str |
 # REPORTS
 # ──────────────────────────────────────
 
+@_timed
 def create_report(data: dict) -> dict:
+    """Store a report and award its eco-points in one commit.
+
+    Raises ValueError if the reporter has no user document; nothing is
+    written in that case.
+    """
+    if get_user(data["user_id"]) is None:
+        raise ValueError("User not found")
     report_id = _new_id()
     doc = {
         "report_id": report_id,
@@ -113,6 +182,7 @@ def create_report(data: dict) -> dict:
         "image_url": data.get("image_url", ""),
         "geo_lat": data.get("geo_lat", 0.0),
         "geo_lng": data.get("geo_lng", 0.0),
+        "geohash": geo.encode(data.get("geo_lat", 0.0), data.get("geo_lng", 0.0)),
         "heading": data.get("heading"),  # compass heading (degrees) user was facing
         "waste_type": data.get("waste_type", "mixed"),
         "severity": data.get("severity", "medium"),
@@ -126,28 +196,170 @@ def create_report(data: dict) -> dict:
     trash_count = max(data.get("trash_count", 1), 1)
     points = trash_count * 33
     doc["points_earned"] = points
-    db.collection("reports").document(report_id).set(doc)
-    add_eco_points(data["user_id"], "report", points)
+    # Report, ledger entry, balance and counters in one commit
+    batch = db.batch()
+    batch.set(db.collection("reports").document(report_id), doc)
+    _queue_eco_points(batch, data["user_id"], "report", points)
+    _bump_counters(batch, total_reports=1, total_points_distributed=points)
+    try:
+        batch.commit()
+    except NotFound:
+        # User deleted since the check above; the batch wrote nothing
+        _users.invalidate(data["user_id"])
+        raise ValueError("User not found") from None
+    _users.update(data["user_id"], {"eco_points_balance": Increment(points)})
+    _recent_reports.add(doc)
     return doc
 
 
+# Every status except "cleaned" – cleaned reports are hidden from listings.
+ACTIVE_REPORT_STATUSES = ["pending", "verified", "rejected"]
+
+
+def _encode_cursor(item: dict) -> str:
+    raw = json.dumps({"created_at": item.get("created_at", ""), "report_id": item.get("report_id", "")})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        decoded = {"created_at": values["created_at"], "report_id": values["report_id"]}
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(v, str) for v in decoded.values()):
+        raise ValueError("Invalid cursor")
+    return decoded
+
+
+@_timed
+def get_reports_page(
+    waste_type: str | None = None,
+    severity: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+) -> tuple[list[dict], str | None]:
+    """Return (reports, next_cursor) for the newest uncleaned reports.
+
+    All filters run in Firestore (see firestore.indexes.json), so every
+    document read is returned. `next_cursor` is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    query = db.collection("reports").where(filter=FieldFilter("status", "in", ACTIVE_REPORT_STATUSES))
+    if waste_type:
+        query = query.where(filter=FieldFilter("waste_type", "==", waste_type))
+    if severity:
+        query = query.where(filter=FieldFilter("severity", "==", severity))
+    query = (
+        query.order_by("created_at", direction="DESCENDING")
+        .order_by("report_id", direction="DESCENDING")
+    )
+    if cursor:
+        query = query.start_after(_decode_cursor(cursor))
+    results = [d.to_dict() for d in query.limit(limit).stream()]
+    next_cursor = _encode_cursor(results[-1]) if results and len(results) == limit else None
+    return results, next_cursor
+
+
+@_timed
 def get_reports(waste_type: str | None = None, severity: str | None = None, limit: int = 50) -> list[dict]:
-    ref = db.collection("reports")
-    query = ref.order_by("created_at", direction="DESCENDING").limit(limit)
-    docs = query.stream()
+    return get_reports_page(waste_type=waste_type, severity=severity, limit=limit)[0]
+
+
+# Upper bound on geohash cells used to cover a viewport; adjacent cells are
+# merged into range queries, so the number of queries is usually much lower.
+_BBOX_MAX_CELLS = 16
+
+
+@_timed
+def get_reports_in_bbox(
+    min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+    waste_type: str | None = None, severity: str | None = None, limit: int = 50,
+) -> list[dict]:
+    """Return up to `limit` uncleaned reports inside a bounding box, newest first.
+
+    The box is covered with geohash cells and each run of adjacent cells is
+    fetched with range queries on the stored `geohash` field, with the
+    status / type / severity filters and a limit applied in Firestore (see
+    firestore.indexes.json). Ranges are read in geohash order and reading
+    stops once `limit` reports inside the box have been found, so a dense
+    viewport returns a subset of its reports rather than the newest ones.
+    """
+    precision = geo.covering_precision(min_lat, min_lng, max_lat, max_lng, _BBOX_MAX_CELLS)
+    cells = geo.cells_covering(min_lat, min_lng, max_lat, max_lng, precision)
+    base = db.collection("reports").where(filter=FieldFilter("status", "in", ACTIVE_REPORT_STATUSES))
+    if waste_type:
+        base = base.where(filter=FieldFilter("waste_type", "==", waste_type))
+    if severity:
+        base = base.where(filter=FieldFilter("severity", "==", severity))
     results = []
-    for d in docs:
+    for start, end in geo.prefix_ranges(cells):
+        query = (
+            base.where(filter=FieldFilter("geohash", ">=", start))
+            .where(filter=FieldFilter("geohash", "<", end))
+            .order_by("geohash")
+            .order_by("report_id")
+        )
+        # Cells overhang the box, so a page can contain reports outside it;
+        # keep paging through the range until it runs out or `limit` is met.
+        last = None
+        while len(results) < limit:
+            page_size = limit - len(results)
+            page = query.start_after(last) if last else query
+            items = [d.to_dict() for d in page.limit(page_size).stream()]
+            for item in items:
+                if min_lat <= item.get("geo_lat", 0) <= max_lat and min_lng <= item.get("geo_lng", 0) <= max_lng:
+                    results.append(item)
+            if len(items) < page_size:
+                break
+            last = {"geohash": items[-1].get("geohash"), "report_id": items[-1].get("report_id")}
+        if len(results) >= limit:
+            break
+    results.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+    return results
+
+
+@_timed
+def backfill_report_geohashes(batch_size: int = 400) -> int:
+    """Write the `geohash` field on reports created before it existed.
+
+    Returns the number of documents updated.
+    """
+    updated = 0
+    batch = db.batch()
+    pending = 0
+    for d in db.collection("reports").select(["geo_lat", "geo_lng", "geohash"]).stream():
         item = d.to_dict()
-        if item.get("status") == "cleaned":
+        if item.get("geohash"):
             continue
-        if waste_type and item.get("waste_type") != waste_type:
-            continue
-        if severity and item.get("severity") != severity:
-            continue
-        results.append(item)
-    return results
+        batch.update(d.reference, {"geohash": geo.encode(item.get("geo_lat", 0.0), item.get("geo_lng", 0.0))})
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            updated += pending
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+        updated += pending
+    return updated
+
+
+@_timed
+def get_report_points() -> list[dict]:
+    """Location, severity and waste type of every report that isn't cleaned yet.
+
+    Only the fields needed for heatmap binning are transferred.
+    """
+    docs = (
+        db.collection("reports")
+        .select(["geo_lat", "geo_lng", "severity", "waste_type", "status"])
+        .stream()
+    )
+    return [r for r in (d.to_dict() for d in docs) if r.get("status") != "cleaned"]
 
 
+@_timed
 def get_report(report_id: str) -> dict | None:
     snap = db.collection("reports").document(report_id).get()
     if snap.exists:
@@ -155,6 +367,7 @@ def get_report(report_id: str) -> dict | None:
     return None
 
 
+@_timed
 def get_user_reports(uid: str, limit: int = 20) -> list[dict]:
     docs = (
         db.collection("reports")
@@ -168,37 +381,57 @@ def get_user_reports(uid: str, limit: int = 20) -> list[dict]:
     return results
 
 
-def mark_report_cleaned(report_id: str, user_id: str, cleanup_image_url: str = "") -> dict | None:
-    """Mark a report as 'cleaned', store the cleanup photo, and award 100 eco-points."""
-    ref = db.collection("reports").document(report_id)
-    snap = ref.get()
+def _clean_report(transaction, ref, user_id: str, cleanup_image_url: str) -> dict | None:
+    user_ref = db.collection("users").document(user_id)
+    snaps = {s.reference.path: s for s in transaction.get_all([ref, user_ref])}
+    snap = snaps[ref.path]
     if not snap.exists:
         return None
+    if not snaps[user_ref.path].exists:
+        raise ValueError("User not found")
     report = snap.to_dict()
     if report.get("status") == "cleaned":
         return {"already_cleaned": True, **report}
-    ref.update({
+    updates = {
         "status": "cleaned",
         "cleanup_image_url": cleanup_image_url,
         "cleaned_by": user_id,
         "cleaned_at": _now(),
-    })
+    }
+    transaction.update(ref, updates)
     # Award cleanup points (100)
-    add_eco_points(user_id, "cleanup", 100)
-    return {**report, "status": "cleaned", "cleanup_image_url": cleanup_image_url}
+    _queue_eco_points(transaction, user_id, "cleanup", 100)
+    _bump_counters(transaction, total_cleaned=1, total_points_distributed=100)
+    return {**report, **updates}
+
+
+@_timed
+def mark_report_cleaned(report_id: str, user_id: str, cleanup_image_url: str = "") -> dict | None:
+    """Mark a report as 'cleaned', store the cleanup photo, and award 100 eco-points.
+
+    One transaction, so a report can only be cleaned (and rewarded) once.
+    Returns None if the report doesn't exist; raises ValueError if the user
+    doesn't (nothing is written).
+    """
+    ref = db.collection("reports").document(report_id)
+    # A fresh transactional() per call: the wrapper keeps per-attempt state
+    # (retry_id / current_id) on itself, so a shared one isn't thread-safe.
+    result = transactional(_clean_report)(db.transaction(), ref, user_id, cleanup_image_url)
+    if result and not result.get("already_cleaned"):
+        _users.update(user_id, {"eco_points_balance": Increment(100)})
+    return result
 
 
 # ──────────────────────────────────────
 # TRASHCARE JOBS
 # ──────────────────────────────────────
 
-def create_job(data: dict) -> dict:
-    """Create a job posting. Validates tokens + credits before creating.
-    Deducts credits and escrows tokens from the poster."""
-    user_id = data["posted_by"]
-    user = get_user(user_id)
-    if not user:
+def _post_job(transaction, user_id: str, data: dict) -> tuple[dict, dict]:
+    user_ref = db.collection("users").document(user_id)
+    snap = user_ref.get(transaction=transaction)
+    if not snap.exists:
         raise ValueError("User not found")
+    user = snap.to_dict()
 
     credits_cost = data.get("credits_cost", 10)
     token_reward = data.get("token_reward", 0)
@@ -214,17 +447,16 @@ def create_job(data: dict) -> dict:
         raise ValueError(f"Insufficient tokens. Need {token_reward}, have {user_tokens}")
 
     # Deduct credits and escrow tokens
-    new_credits = user_credits - credits_cost
-    new_tokens = user_tokens - token_reward
-    db.collection("users").document(user_id).update({
-        "credits_balance": new_credits,
-        "eco_tokens_balance": new_tokens,
-    })
+    balances = {
+        "credits_balance": user_credits - credits_cost,
+        "eco_tokens_balance": user_tokens - token_reward,
+    }
+    transaction.update(user_ref, balances)
 
     # Log token escrow transaction
     if token_reward > 0:
         tx_id = _new_id()
-        db.collection("token_transactions").document(tx_id).set({
+        transaction.set(db.collection("token_transactions").document(tx_id), {
             "transaction_id": tx_id,
             "user_id": user_id,
             "type": "escrow",
@@ -253,10 +485,27 @@ def create_job(data: dict) -> dict:
         "status": "open",
         "created_at": _now(),
     }
-    db.collection("jobs").document(job_id).set(doc)
+    transaction.set(db.collection("jobs").document(job_id), doc)
+    _bump_counters(transaction, total_jobs=1)
+    return doc, balances
+
+
+@_timed
+def create_job(data: dict) -> dict:
+    """Create a job posting. Validates tokens + credits before creating.
+    Deducts credits and escrows tokens from the poster.
+
+    One transaction on a fresh read of the poster, so concurrent postings
+    can't spend the same balance twice. Raises ValueError if the user is
+    missing or short of credits / tokens.
+    """
+    user_id = data["posted_by"]
+    doc, balances = transactional(_post_job)(db.transaction(), user_id, data)
+    _users.update(user_id, balances)
     return doc
 
 
+@_timed
 def get_jobs(limit: int = 50) -> list[dict]:
     """Return only approved jobs for public listing."""
     docs = (
@@ -268,6 +517,7 @@ def get_jobs(limit: int = 50) -> list[dict]:
     return [d.to_dict() for d in docs if d.to_dict().get("approval_status") == "approved"]
 
 
+@_timed
 def get_pending_jobs() -> list[dict]:
     """Return jobs pending admin approval."""
     docs = db.collection("jobs").stream()
@@ -276,6 +526,7 @@ def get_pending_jobs() -> list[dict]:
     return results
 
 
+@_timed
 def approve_job(job_id: str, reviewer_id: str, note: str = "") -> dict | None:
     ref = db.collection("jobs").document(job_id)
     snap = ref.get()
@@ -288,6 +539,7 @@ def approve_job(job_id: str, reviewer_id: str, note: str = "") -> dict | None:
     return ref.get().to_dict()
 
 
+@_timed
 def reject_job(job_id: str, reviewer_id: str, note: str = "") -> dict | None:
     """Reject a job and refund the poster's credits + tokens."""
     ref = db.collection("jobs").document(job_id)
@@ -310,15 +562,17 @@ def reject_job(job_id: str, reviewer_id: str, note: str = "") -> dict | None:
             refund_tokens = job.get("token_reward", 0)
             updates = {}
             if refund_credits:
-                updates["credits_balance"] = user.get("credits_balance", 0) + refund_credits
+                updates["credits_balance"] = Increment(refund_credits)
             if refund_tokens:
-                updates["eco_tokens_balance"] = user.get("eco_tokens_balance", 0) + refund_tokens
+                updates["eco_tokens_balance"] = Increment(refund_tokens)
             if updates:
                 db.collection("users").document(poster_id).update(updates)
+                _users.update(poster_id, updates)
 
     return ref.get().to_dict()
 
 
+@_timed
 def apply_to_job(data: dict) -> dict:
     app_id = _new_id()
     doc = {
@@ -336,38 +590,48 @@ def apply_to_job(data: dict) -> dict:
 # REWARDS & REDEMPTIONS
 # ──────────────────────────────────────
 
-def get_rewards() -> list[dict]:
-    """Return all rewards PLUS partner products that have a points_price > 0."""
-    # 1. Classic rewards from the rewards collection
-    rewards = [d.to_dict() for d in db.collection("rewards").stream()]
+# Icon shown for partner products on the rewards page, by product category
+CATEGORY_ICONS = {
+    "food": "🍔",
+    "drink": "🥤",
+    "merchandise": "👕",
+    "service": "🛠️",
+    "general": "🎁",
+    "other": "📦",
+}
 
-    # 2. Partner products redeemable with eco-points
-    products = [d.to_dict() for d in db.collection("products").stream()]
+
+def build_rewards_view(rewards: list[dict], products: list[dict]) -> list[dict]:
+    """Rewards plus partner products with a points_price > 0, mapped to the reward shape."""
+    view = list(rewards)
     for p in products:
         if p.get("points_price", 0) > 0:
-            # Map product fields → reward shape
-            category_icons = {
-                "food": "🍔",
-                "drink": "🥤",
-                "merchandise": "👕",
-                "service": "🛠️",
-                "general": "🎁",
-                "other": "📦",
-            }
-            rewards.append({
+            view.append({
                 "reward_id": p["product_id"],
                 "name": p.get("name", ""),
                 "description": p.get("description", ""),
                 "points_required": p["points_price"],
                 "stock": p.get("stock", 0),
-                "icon": category_icons.get(p.get("category", "general"), "🎁"),
+                "icon": CATEGORY_ICONS.get(p.get("category", "general"), "🎁"),
                 "partner_name": p.get("partner_name", "Partner"),
                 "partner_id": p.get("partner_id", ""),
             })
+    return view
+
 
-    return rewards
+@_timed
+def get_rewards() -> list[dict]:
+    """Return all rewards PLUS partner products that have a points_price > 0.
 
+    Reads both collections; GET /api/rewards normally serves the listener-fed
+    copy in rewards_catalog instead.
+    """
+    rewards = [_with_live_stock(d) for d in db.collection("rewards").stream()]
+    products = [_with_live_stock(d) for d in db.collection("products").stream()]
+    return build_rewards_view(rewards, products)
 
+
+@_timed
 def create_reward(data: dict) -> dict:
     reward_id = _new_id()
     doc = {
@@ -384,54 +648,141 @@ def create_reward(data: dict) -> dict:
     return doc
 
 
+@_timed
 def update_reward(reward_id: str, updates: dict) -> dict | None:
     ref = db.collection("rewards").document(reward_id)
-    snap = ref.get()
-    if not snap.exists:
-        return None
-    clean = {k: v for k, v in updates.items() if v is not None}
-    if clean:
-        ref.update(clean)
-    return ref.get().to_dict()
+    return transactional(_update_stocked_item)(db.transaction(), ref, updates)
 
 
+@_timed
 def delete_reward(reward_id: str) -> bool:
     ref = db.collection("rewards").document(reward_id)
     snap = ref.get()
     if not snap.exists:
         return False
-    ref.delete()
+    batch = db.batch()
+    batch.delete(ref)
+    _queue_stock_shard_deletes(batch, ref, 0, snap.to_dict().get("stock_shards", 0))
+    batch.commit()
     return True
 
 
-def redeem_reward(user_id: str, reward_id: str) -> dict | None:
+# Stock of a hot reward / product can be spread over `stock_shards` documents
+# under <item>/stock_shards/<n>. Redemptions then decrement one shard each
+# instead of all writing the item document, so a flash sale doesn't
+# serialize on it. While sharded, the item's own `stock` field is only the
+# total as of the last admin edit; the shards hold the live count.
+STOCK_SHARDS = "stock_shards"
+# Re-spreading stock writes every new shard and deletes every old one in one
+# transaction, which must stay under Firestore's 500 writes per commit.
+MAX_STOCK_SHARDS = 200
+
+
+def _current_stock(ref, item: dict, transaction=None) -> int:
+    shards = item.get("stock_shards", 0)
+    if not shards:
+        return item.get("stock", 0)
+    docs = ref.collection(STOCK_SHARDS).stream(transaction=transaction)
+    return sum(d.to_dict().get("stock", 0) for d in docs)
+
+
+def _with_live_stock(snap) -> dict:
+    item = snap.to_dict()
+    if item.get("stock_shards"):
+        item["stock"] = _current_stock(snap.reference, item)
+    return item
+
+
+def _queue_stock_shard_deletes(batch, ref, keep: int, existing: int) -> None:
+    for n in range(keep, existing):
+        batch.delete(ref.collection(STOCK_SHARDS).document(str(n)))
+
+
+def _queue_stock(batch, ref, stock: int, shards: int, old_shards: int) -> None:
+    """Set the item's stock as part of `batch`, spread evenly over `shards` shards (0 = unsharded)."""
+    if shards:
+        base, extra = divmod(max(stock, 0), shards)
+        for n in range(shards):
+            batch.set(ref.collection(STOCK_SHARDS).document(str(n)), {"stock": base + (n < extra)})
+    _queue_stock_shard_deletes(batch, ref, shards, old_shards)
+    batch.update(ref, {"stock": stock, "stock_shards": shards})
+
+
+def _update_stocked_item(transaction, ref, updates: dict) -> dict | None:
+    """Apply admin edits to a reward / product; a new `stock` or `stock_shards`
+    re-spreads the stock over the shards."""
+    snap = ref.get(transaction=transaction)
+    if not snap.exists:
+        return None
+    item = snap.to_dict()
+    clean = {k: v for k, v in updates.items() if v is not None}
+    respread = "stock" in clean or "stock_shards" in clean
+    old_shards = item.get("stock_shards", 0)
+    shards = min(max(clean.pop("stock_shards", old_shards), 0), MAX_STOCK_SHARDS)
+    stock = clean.pop("stock", None)
+    if stock is None:
+        stock = _current_stock(ref, item, transaction)
+    # Other edits leave the shards (and redemptions since the last spread) alone
+    if respread:
+        _queue_stock(transaction, ref, stock, shards, old_shards)
+    if clean:
+        transaction.update(ref, clean)
+    return {**item, **clean, "stock": stock, "stock_shards": shards}
+
+
+def _take_stock_shard(transaction, ref, shards: int):
+    """Pick a shard with stock left (random one first), or None if sold out."""
+    shard = ref.collection(STOCK_SHARDS).document(str(random.randrange(shards)))
+    snap = shard.get(transaction=transaction)
+    if snap.exists and snap.to_dict().get("stock", 0) > 0:
+        return shard
+    others = (
+        ref.collection(STOCK_SHARDS)
+        .where(filter=FieldFilter("stock", ">", 0))
+        .limit(1)
+        .stream(transaction=transaction)
+    )
+    for snap in others:
+        return snap.reference
+    return None
+
+
+def _redeem(transaction, user_id: str, reward_id: str) -> tuple[dict, int] | None:
+    reward_ref = db.collection("rewards").document(reward_id)
+    product_ref = db.collection("products").document(reward_id)
+    user_ref = db.collection("users").document(user_id)
+    # Reward, its product fallback and the user in one read
+    snaps = {s.reference.path: s for s in transaction.get_all([reward_ref, product_ref, user_ref])}
+
     # Try the rewards collection first, then fall back to products
-    reward_snap = db.collection("rewards").document(reward_id).get()
-    source_collection = "rewards"
-    if reward_snap.exists:
-        reward = reward_snap.to_dict()
+    if snaps[reward_ref.path].exists:
+        item_ref = reward_ref
+        reward = snaps[reward_ref.path].to_dict()
         points_needed = reward.get("points_required", 0)
-    else:
-        # Check products collection (partner products redeemable with points)
-        prod_snap = db.collection("products").document(reward_id).get()
-        if not prod_snap.exists:
-            return None
-        reward = prod_snap.to_dict()
+    elif snaps[product_ref.path].exists:
+        # Partner products redeemable with points
+        item_ref = product_ref
+        reward = snaps[product_ref.path].to_dict()
         points_needed = reward.get("points_price", 0)
-        source_collection = "products"
+    else:
+        return None
 
     # Check user points
-    user = get_user(user_id)
-    if not user:
-        return None
-    if user.get("eco_points_balance", 0) < points_needed:
+    user_snap = snaps[user_ref.path]
+    if not user_snap.exists or user_snap.to_dict().get("eco_points_balance", 0) < points_needed:
         return None
 
-    # Check stock
-    if reward.get("stock", 0) <= 0:
+    # Check stock (all reads happen before the first write)
+    shards = reward.get("stock_shards", 0)
+    if shards:
+        stock_ref = _take_stock_shard(transaction, item_ref, shards)
+        if stock_ref is None:
+            return None
+    elif reward.get("stock", 0) <= 0:
         return None
+    else:
+        stock_ref = item_ref
 
-    # Create redemption
     redemption_id = _new_id()
     code = f"ECO-{uuid.uuid4().hex[:6].upper()}"
     doc = {
@@ -443,16 +794,27 @@ def redeem_reward(user_id: str, reward_id: str) -> dict | None:
         "code": code,
         "redeemed_at": _now(),
     }
-    db.collection("redemptions").document(redemption_id).set(doc)
+    transaction.set(db.collection("redemptions").document(redemption_id), doc)
+    transaction.update(user_ref, {"eco_points_balance": Increment(-points_needed)})
+    transaction.update(stock_ref, {"stock": Increment(-1)})
+    _bump_counters(transaction, total_rewards_redeemed=1)
+    return doc, points_needed
 
-    # Deduct points
-    new_balance = user["eco_points_balance"] - points_needed
-    db.collection("users").document(user_id).update({"eco_points_balance": new_balance})
-
-    # Decrement stock in the correct collection
-    doc_id = reward.get("product_id", reward_id) if source_collection == "products" else reward_id
-    db.collection(source_collection).document(doc_id).update({"stock": reward["stock"] - 1})
 
+@_timed
+def redeem_reward(user_id: str, reward_id: str) -> dict | None:
+    """Redeem a reward or partner product for eco-points.
+
+    One transaction: the points check, stock check, redemption, points
+    deduction and stock decrement commit together or not at all, so the
+    last unit can't be sold twice. Returns None if the item or user doesn't
+    exist, the balance is too low, or the item is out of stock.
+    """
+    result = transactional(_redeem)(db.transaction(), user_id, reward_id)
+    if result is None:
+        return None
+    doc, points_spent = result
+    _users.update(user_id, {"eco_points_balance": Increment(-points_spent)})
     return doc
 
 
@@ -467,7 +829,21 @@ POINT_VALUES = {
 }
 
 
-def add_eco_points(user_id: str, action: str, points: int | None = None) -> dict:
+# Writes per award (ledger doc + balance increment); the shared counter shard
+# adds one more per batch, and Firestore allows 500 writes per batch.
+_AWARDS_PER_BATCH = 200
+
+
+def _queue_eco_points(batch, user_id: str, action: str, points: int | None = None,
+                      credit_balance: bool = True) -> dict:
+    """Add the ledger entry and balance increment for one award to `batch`
+    (a WriteBatch or Transaction).
+
+    The balance is incremented server-side, so concurrent awards never
+    overwrite each other. Committing fails with NotFound (and writes nothing)
+    if the user document doesn't exist, so callers check first or pass
+    credit_balance=False to write the ledger entry only.
+    """
     pts = points if points is not None else POINT_VALUES.get(action, 10)
     points_id = _new_id()
     doc = {
@@ -477,18 +853,45 @@ def add_eco_points(user_id: str, action: str, points: int | None = None) -> dict
         "points_earned": pts,
         "created_at": _now(),
     }
-    db.collection("eco_points").document(points_id).set(doc)
+    batch.set(db.collection("eco_points").document(points_id), doc)
+    if credit_balance:
+        batch.update(db.collection("users").document(user_id), {"eco_points_balance": Increment(pts)})
+    return doc
 
-    # Update user balance
-    user_ref = db.collection("users").document(user_id)
-    user_snap = user_ref.get()
-    if user_snap.exists:
-        current = user_snap.to_dict().get("eco_points_balance", 0)
-        user_ref.update({"eco_points_balance": current + pts})
 
-    return doc
+@_timed
+def add_eco_points(user_id: str, action: str, points: int | None = None) -> dict:
+    """Credit one award: ledger entry + balance increment in a single commit."""
+    return add_eco_points_bulk([(user_id, action, points)])[0]
 
 
+def _award_chunk(transaction, awards: list[tuple[str, str, int | None]]) -> tuple[list[dict], set[str]]:
+    user_refs = {uid: db.collection("users").document(uid) for uid, _, _ in awards}
+    existing = {s.reference.id for s in transaction.get_all(list(user_refs.values())) if s.exists}
+    docs = [_queue_eco_points(transaction, uid, action, points, uid in existing) for uid, action, points in awards]
+    _bump_counters(transaction, total_points_distributed=sum(d["points_earned"] for d in docs))
+    return docs, existing
+
+
+@_timed
+def add_eco_points_bulk(awards: list[tuple[str, str, int | None]]) -> list[dict]:
+    """Credit many (user_id, action, points) awards, one transaction per 200 awards.
+
+    Each commit is atomic; a user may appear more than once. Like before the
+    balance moved to server-side increments, an award for a user without a
+    user document only writes its ledger entry.
+    """
+    docs = []
+    for start in range(0, len(awards), _AWARDS_PER_BATCH):
+        chunk, existing = transactional(_award_chunk)(db.transaction(), awards[start:start + _AWARDS_PER_BATCH])
+        for d in chunk:
+            if d["user_id"] in existing:
+                _users.update(d["user_id"], {"eco_points_balance": Increment(d["points_earned"])})
+        docs.extend(chunk)
+    return docs
+
+
+@_timed
 def get_user_points_history(user_id: str) -> list[dict]:
     docs = (
         db.collection("eco_points")
@@ -504,14 +907,16 @@ def get_user_points_history(user_id: str) -> list[dict]:
 # ECO TOKENS & CREDITS
 # ──────────────────────────────────────
 
+@_timed
 def purchase_tokens(user_id: str, amount: int, php_amount: float) -> dict:
     """Purchase eco tokens (mock payment). 1 token = 1 PHP."""
     user = get_user(user_id)
     if not user:
         raise ValueError("User not found")
 
-    new_balance = user.get("eco_tokens_balance", 0) + amount
-    db.collection("users").document(user_id).update({"eco_tokens_balance": new_balance})
+    credit = {"eco_tokens_balance": Increment(amount)}
+    db.collection("users").document(user_id).update(credit)
+    _users.update(user_id, credit)
 
     tx_id = _new_id()
     doc = {
@@ -526,41 +931,56 @@ def purchase_tokens(user_id: str, amount: int, php_amount: float) -> dict:
     return doc
 
 
-def convert_points_to_credits(user_id: str, points_to_convert: int) -> dict:
-    """Convert eco points to credits. 5 points = 1 credit."""
-    if points_to_convert < 5 or points_to_convert % 5 != 0:
-        raise ValueError("Points must be a multiple of 5")
-
-    user = get_user(user_id)
-    if not user:
+def _convert_points(transaction, user_id: str, points_to_convert: int) -> dict:
+    user_ref = db.collection("users").document(user_id)
+    snap = user_ref.get(transaction=transaction)
+    if not snap.exists:
         raise ValueError("User not found")
+    user = snap.to_dict()
 
     current_points = user.get("eco_points_balance", 0)
     if current_points < points_to_convert:
         raise ValueError(f"Insufficient points. Need {points_to_convert}, have {current_points}")
 
     credits_gained = points_to_convert // 5
-    new_points = current_points - points_to_convert
-    new_credits = user.get("credits_balance", 0) + credits_gained
-
-    db.collection("users").document(user_id).update({
-        "eco_points_balance": new_points,
-        "credits_balance": new_credits,
-    })
+    balances = {
+        "eco_points_balance": current_points - points_to_convert,
+        "credits_balance": user.get("credits_balance", 0) + credits_gained,
+    }
+    transaction.update(user_ref, balances)
 
     tx_id = _new_id()
-    doc = {
+    transaction.set(db.collection("token_transactions").document(tx_id), {
         "transaction_id": tx_id,
         "user_id": user_id,
         "type": "convert",
         "amount": credits_gained,
         "php_amount": 0.0,
         "created_at": _now(),
+    })
+    return balances
+
+
+@_timed
+def convert_points_to_credits(user_id: str, points_to_convert: int) -> dict:
+    """Convert eco points to credits. 5 points = 1 credit.
+
+    The balance check and both balance updates run in one transaction on a
+    fresh read; the returned balances are the committed ones.
+    """
+    if points_to_convert < 5 or points_to_convert % 5 != 0:
+        raise ValueError("Points must be a multiple of 5")
+
+    balances = transactional(_convert_points)(db.transaction(), user_id, points_to_convert)
+    _users.update(user_id, balances)
+    return {
+        "credits_gained": points_to_convert // 5,
+        "new_points": balances["eco_points_balance"],
+        "new_credits": balances["credits_balance"],
     }
-    db.collection("token_transactions").document(tx_id).set(doc)
-    return {"credits_gained": credits_gained, "new_points": new_points, "new_credits": new_credits}
 
 
+@_timed
 def get_token_transactions(user_id: str) -> list[dict]:
     docs = (
         db.collection("token_transactions")
@@ -576,12 +996,14 @@ def get_token_transactions(user_id: str) -> list[dict]:
 # USER ROLE MANAGEMENT
 # ──────────────────────────────────────
 
+@_timed
 def get_all_users() -> list[dict]:
     """Return all user docs (admin use)."""
     docs = db.collection("users").stream()
     return [d.to_dict() for d in docs]
 
 
+@_timed
 def update_user_role(uid: str, role: str) -> dict | None:
     """Set user role to 'user', 'partner', or 'admin'."""
     ref = db.collection("users").document(uid)
@@ -589,14 +1011,15 @@ def update_user_role(uid: str, role: str) -> dict | None:
         ref.update({"role": role})          # single Firestore call; raises NotFound if missing
     except Exception:
         return None
-    snap = ref.get()
-    return snap.to_dict() if snap.exists else None
+    _users.update(uid, {"role": role})
+    return get_user(uid)
 
 
 # ──────────────────────────────────────
 # PARTNER PRODUCTS
 # ──────────────────────────────────────
 
+@_timed
 def create_product(data: dict) -> dict:
     product_id = _new_id()
     # Look up partner name for display on rewards page
@@ -617,38 +1040,42 @@ def create_product(data: dict) -> dict:
         "image_url": data.get("image_url", ""),
         "created_at": _now(),
     }
-    db.collection("products").document(product_id).set(doc)
+    batch = db.batch()
+    batch.set(db.collection("products").document(product_id), doc)
+    _bump_counters(batch, total_products=1)
+    batch.commit()
     return doc
 
 
+@_timed
 def get_products(partner_id: str | None = None) -> list[dict]:
     ref = db.collection("products")
     if partner_id:
         docs = ref.where(filter=FieldFilter("partner_id", "==", partner_id)).stream()
     else:
         docs = ref.stream()
-    results = [d.to_dict() for d in docs]
+    results = [_with_live_stock(d) for d in docs]
     results.sort(key=lambda x: x.get("created_at", ""), reverse=True)
     return results
 
 
+@_timed
 def update_product(product_id: str, updates: dict) -> dict | None:
     ref = db.collection("products").document(product_id)
-    snap = ref.get()
-    if not snap.exists:
-        return None
-    clean = {k: v for k, v in updates.items() if v is not None}
-    if clean:
-        ref.update(clean)
-    return ref.get().to_dict()
+    return transactional(_update_stocked_item)(db.transaction(), ref, updates)
 
 
+@_timed
 def delete_product(product_id: str) -> bool:
     ref = db.collection("products").document(product_id)
     snap = ref.get()
     if not snap.exists:
         return False
-    ref.delete()
+    batch = db.batch()
+    batch.delete(ref)
+    _queue_stock_shard_deletes(batch, ref, 0, snap.to_dict().get("stock_shards", 0))
+    _bump_counters(batch, total_products=-1)
+    batch.commit()
     return True
 
 
@@ -656,8 +1083,66 @@ def delete_product(product_id: str) -> bool:
 # DASHBOARD STATS
 # ──────────────────────────────────────
 
+# Totals are spread over COUNTER_SHARDS documents under stats/dashboard/shards.
+# Every write that changes a total increments one random shard in the same
+# batch, so concurrent writers rarely touch the same counter document.
+COUNTER_SHARDS = 10
+COUNTER_FIELDS = [
+    "total_users",
+    "total_reports",
+    "total_cleaned",
+    "total_points_distributed",
+    "total_rewards_redeemed",
+    "total_jobs",
+    "total_products",
+]
+
+# Recent items come from a limited query on each collection's timestamp
+# (single-field index), so writers never share a "recent" document.
+RECENT_LIMIT = 5
+_RECENT_SORT_KEYS = {"reports": "created_at", "redemptions": "redeemed_at"}
+
+
+def _counter_shards():
+    return db.collection("stats").document("dashboard").collection("shards")
+
+
+def _bump_counters(batch, **deltas: int) -> None:
+    """Add `deltas` to one random counter shard as part of `batch`."""
+    shard = _counter_shards().document(str(random.randrange(COUNTER_SHARDS)))
+    batch.set(shard, {field: Increment(n) for field, n in deltas.items()}, merge=True)
+
+
+def _get_recent(kind: str) -> list[dict]:
+    query = db.collection(kind).order_by(_RECENT_SORT_KEYS[kind], direction="DESCENDING").limit(RECENT_LIMIT)
+    return [d.to_dict() for d in query.stream()]
+
+
+@_timed
 def get_dashboard_stats() -> dict:
-    """Aggregate stats for the admin/partner dashboard."""
+    """Aggregate stats for the admin/partner dashboard.
+
+    Reads the counter shards and RECENT_LIMIT documents per recent list.
+    """
+    totals = {field: 0 for field in COUNTER_FIELDS}
+    for d in _counter_shards().stream():
+        for field, value in d.to_dict().items():
+            if field in totals:
+                totals[field] += value
+    return {
+        **totals,
+        "recent_reports": _get_recent("reports"),
+        "recent_redemptions": _get_recent("redemptions"),
+    }
+
+
+@_timed
+def rebuild_dashboard_counters() -> dict:
+    """Recount every collection and reset the counter shards.
+
+    Full scan – only for seeding the counters on an existing project or
+    repairing drift; the dashboard endpoint never calls this.
+    """
     users = list(db.collection("users").stream())
     reports = list(db.collection("reports").stream())
     redemptions = list(db.collection("redemptions").stream())
@@ -668,15 +1153,7 @@ def get_dashboard_stats() -> dict:
     total_points = sum(d.to_dict().get("points_earned", 0) for d in points_docs)
     cleaned = sum(1 for d in reports if d.to_dict().get("status") == "cleaned")
 
-    # Recent reports (last 5)
-    report_list = [d.to_dict() for d in reports]
-    report_list.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-
-    # Recent redemptions (last 5)
-    redeem_list = [d.to_dict() for d in redemptions]
-    redeem_list.sort(key=lambda x: x.get("redeemed_at", ""), reverse=True)
-
-    return {
+    totals = {
         "total_users": len(users),
         "total_reports": len(reports),
         "total_cleaned": cleaned,
@@ -684,6 +1161,11 @@ def get_dashboard_stats() -> dict:
         "total_rewards_redeemed": len(redemptions),
         "total_jobs": len(jobs),
         "total_products": len(products),
-        "recent_reports": report_list[:5],
-        "recent_redemptions": redeem_list[:5],
     }
+
+    # Shard 0 holds the full totals; the other shards restart from zero.
+    batch = db.batch()
+    for n in range(COUNTER_SHARDS):
+        batch.set(_counter_shards().document(str(n)), totals if n == 0 else {f: 0 for f in COUNTER_FIELDS})
+    batch.commit()
+    return totals
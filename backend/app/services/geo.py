@@ -0,0 +1,211 @@
+"""
+Geohash helpers and an in-process grid index of recent report locations.
+"""
+import math
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_METERS_PER_DEGREE = 111_320
+
+# Precision stored on every report (~4.8m x 4.8m cells). Shorter prefixes
+# of the same string give the coarser cells used for lookups.
+GEOHASH_PRECISION = 9
+
+
+def haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Haversine distance in meters between two lat/lng points."""
+    R = 6_371_000
+    to_rad = lambda d: d * math.pi / 180
+    dLat = to_rad(lat2 - lat1)
+    dLng = to_rad(lng2 - lng1)
+    a = math.sin(dLat / 2) ** 2 + math.cos(to_rad(lat1)) * math.cos(to_rad(lat2)) * math.sin(dLng / 2) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a lat/lng pair as a geohash string of the given length."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    ch = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits = 0
+            ch = 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision: int) -> tuple[float, float]:
+    """Return (lat_degrees, lng_degrees) spanned by one cell of this precision."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def precision_for_radius(radius_m: float) -> int:
+    """Longest precision whose cells are still at least `radius_m` tall.
+
+    With cells at least as large as the search radius, a circle around any
+    point touches at most the 3x3 block of cells around it.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, _ = cell_size_degrees(precision)
+        if lat_deg * _METERS_PER_DEGREE >= radius_m:
+            return precision
+    return 1
+
+
+def cells_covering(min_lat: float, min_lng: float, max_lat: float, max_lng: float, precision: int) -> set[str]:
+    """Return every geohash cell of `precision` that intersects the bounding box.
+
+    The box is clamped to the valid lat/lng range; raises ValueError for
+    non-finite coordinates, which would never finish stepping.
+    """
+    if not all(math.isfinite(v) for v in (min_lat, min_lng, max_lat, max_lng)):
+        raise ValueError("Bounding box coordinates must be finite")
+    lat_step, lng_step = cell_size_degrees(precision)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+    cells = set()
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells.add(encode(lat, lng, precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + lng_step, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + lat_step, max_lat)
+    return cells
+
+
+def cells_within_radius(lat: float, lng: float, radius_m: float, precision: int) -> set[str]:
+    """Return the cells of `precision` that a circle of `radius_m` can touch."""
+    dlat = radius_m / _METERS_PER_DEGREE
+    dlng = radius_m / (_METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return cells_covering(lat - dlat, lng - dlng, lat + dlat, lng + dlng, precision)
+
+
+def _successor(prefix: str) -> str:
+    """Smallest geohash string that sorts after every string starting with `prefix`."""
+    while prefix:
+        idx = _BASE32.index(prefix[-1])
+        if idx < len(_BASE32) - 1:
+            return prefix[:-1] + _BASE32[idx + 1]
+        prefix = prefix[:-1]
+    return "~"  # sorts after every base32 character
+
+
+def prefix_ranges(cells: set[str]) -> list[tuple[str, str]]:
+    """Turn geohash cells into half-open [start, end) string ranges.
+
+    Cells that are adjacent in geohash order are merged, so a bounding box
+    usually needs far fewer range queries than it has cells.
+    """
+    ranges: list[tuple[str, str]] = []
+    for cell in sorted(cells):
+        end = _successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((cell, end))
+    return ranges
+
+
+def covering_precision(min_lat: float, min_lng: float, max_lat: float, max_lng: float, max_cells: int) -> int:
+    """Longest precision that covers the bounding box with at most `max_cells` cells."""
+    best = 1
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if len(cells_covering(min_lat, min_lng, max_lat, max_lng, precision)) > max_cells:
+            break
+        best = precision
+    return best
+
+
+# ──────────────────────────────────────
+# RECENT REPORT INDEX
+# ──────────────────────────────────────
+
+class RecentReportIndex:
+    """Process-local grid of recent report locations keyed by geohash cell.
+
+    Each entry is (created_at, lat, lng, report_id). `synced_at` records
+    when the index was last refreshed from the database, so callers can
+    fetch only reports written since then.
+    """
+
+    def __init__(self, precision: int):
+        self.precision = precision
+        self.synced_at: datetime | None = None
+        self._cells: dict[str, list[tuple[str, float, float, str]]] = defaultdict(list)
+        self._order: deque[tuple[str, str, str]] = deque()  # (created_at, cell, report_id)
+        self._ids: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, report: dict) -> None:
+        report_id = report.get("report_id", "")
+        created_at = report.get("created_at", "")
+        if not report_id or not created_at:
+            return
+        lat = report.get("geo_lat", 0.0)
+        lng = report.get("geo_lng", 0.0)
+        geohash = report.get("geohash") or encode(lat, lng)
+        cell = geohash[: self.precision]
+        with self._lock:
+            if report_id in self._ids:
+                return
+            self._ids.add(report_id)
+            self._cells[cell].append((created_at, lat, lng, report_id))
+            self._order.append((created_at, cell, report_id))
+
+    def prune(self, cutoff: str) -> None:
+        """Drop entries created before `cutoff` (ISO timestamp)."""
+        with self._lock:
+            while self._order and self._order[0][0] < cutoff:
+                _, cell, report_id = self._order.popleft()
+                self._ids.discard(report_id)
+                kept = [e for e in self._cells[cell] if e[3] != report_id]
+                if kept:
+                    self._cells[cell] = kept
+                else:
+                    del self._cells[cell]
+
+    def find_near(self, lat: float, lng: float, radius_m: float, since: str) -> dict | None:
+        """Return the first indexed report within `radius_m` created at or after `since`."""
+        with self._lock:
+            for cell in cells_within_radius(lat, lng, radius_m, self.precision):
+                for created_at, r_lat, r_lng, report_id in self._cells.get(cell, ()):
+                    if created_at < since:
+                        continue
+                    if haversine_meters(lat, lng, r_lat, r_lng) <= radius_m:
+                        return {"report_id": report_id, "created_at": created_at, "geo_lat": r_lat, "geo_lng": r_lng}
+        return None
@@ -0,0 +1,165 @@
+"""
+Server-side heatmap aggregation.
+
+Report locations are loaded once per HEATMAP_CACHE_SECONDS, projected onto
+web-mercator tiles with NumPy, and binned into weighted cells. Each binned
+tile is cached until the next reload, so panning the map only recomputes
+tiles it has not seen yet.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from itertools import product
+import numpy as np
+from app.core.config import HEATMAP_CACHE_SECONDS, HEATMAP_TILE_BINS
+from app.services import firebase_service as fs
+
+# Same weights the map screen used when it built the heatmap on-device
+SEVERITY_WEIGHTS = {
+    "critical": 1.0,
+    "high": 0.8,
+    "medium": 0.5,
+    "low": 0.3,
+}
+
+MAX_ZOOM = 20
+MAX_TILES = 64          # zoom out until a request bins at most this many tiles
+_TILE_CACHE_SIZE = 1024
+
+
+class _PointSet:
+    """Columnar snapshot of active report locations."""
+
+    def __init__(self, rows: list[dict]):
+        self.lat = np.fromiter((r.get("geo_lat", 0.0) for r in rows), dtype=np.float64, count=len(rows))
+        self.lng = np.fromiter((r.get("geo_lng", 0.0) for r in rows), dtype=np.float64, count=len(rows))
+        self.weight = np.fromiter(
+            (SEVERITY_WEIGHTS.get(r.get("severity", "medium"), 0.5) for r in rows),
+            dtype=np.float64, count=len(rows),
+        )
+        self.waste_type = np.array([r.get("waste_type", "mixed") for r in rows], dtype=object)
+        self.loaded_at = time.monotonic()
+        self._projected: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def projected(self, zoom: int) -> tuple[np.ndarray, np.ndarray]:
+        """Fractional tile coordinates (x, y) of every point at `zoom`."""
+        if zoom not in self._projected:
+            self._projected[zoom] = _project(self.lat, self.lng, zoom)
+        return self._projected[zoom]
+
+
+_lock = threading.Lock()
+_points: _PointSet | None = None
+_tiles: OrderedDict[tuple, list[dict]] = OrderedDict()
+
+
+def _project(lat, lng, zoom: int):
+    """Web-mercator projection to fractional tile coordinates (works on arrays)."""
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lng) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def _unproject(x, y, zoom: int):
+    """Inverse of `_project`: fractional tile coordinates back to (lat, lng)."""
+    n = 2 ** zoom
+    lng = np.asarray(x) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * np.asarray(y) / n))))
+    return lat, lng
+
+
+def _get_points() -> _PointSet:
+    global _points
+    with _lock:
+        if _points is None or time.monotonic() - _points.loaded_at >= HEATMAP_CACHE_SECONDS:
+            _points = _PointSet(fs.get_report_points())
+            _tiles.clear()
+        return _points
+
+
+def tile_range(min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: int) -> tuple[range, range]:
+    """Return the x and y tile index ranges covering a bounding box at `zoom`."""
+    n = 2 ** zoom
+    x0, y0 = _project(max_lat, min_lng, zoom)  # north-west corner
+    x1, y1 = _project(min_lat, max_lng, zoom)  # south-east corner
+    xs = range(max(int(x0), 0), min(int(x1), n - 1) + 1)
+    ys = range(max(int(y0), 0), min(int(y1), n - 1) + 1)
+    return xs, ys
+
+
+def _viewport(points: _PointSet, zoom: int, xs: range, ys: range,
+              waste_type: str | None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Projected coordinates and weights of the points inside the requested tiles."""
+    fx, fy = points.projected(zoom)
+    mask = (fx >= xs.start) & (fx < xs.stop) & (fy >= ys.start) & (fy < ys.stop)
+    if waste_type:
+        mask &= points.waste_type == waste_type
+    return fx[mask], fy[mask], points.weight[mask]
+
+
+def _bin_tile(viewport: tuple[np.ndarray, np.ndarray, np.ndarray], zoom: int, tx: int, ty: int) -> list[dict]:
+    fx, fy, weight = viewport
+    mask = (fx >= tx) & (fx < tx + 1) & (fy >= ty) & (fy < ty + 1)
+    if not mask.any():
+        return []
+
+    bins = HEATMAP_TILE_BINS
+    bx = np.minimum(((fx[mask] - tx) * bins).astype(np.int64), bins - 1)
+    by = np.minimum(((fy[mask] - ty) * bins).astype(np.int64), bins - 1)
+    flat = by * bins + bx
+    weights = np.bincount(flat, weights=weight[mask], minlength=bins * bins)
+    counts = np.bincount(flat, minlength=bins * bins)
+
+    occupied = np.nonzero(counts)[0]
+    cx = tx + (occupied % bins + 0.5) / bins
+    cy = ty + (occupied // bins + 0.5) / bins
+    lat, lng = _unproject(cx, cy, zoom)
+    return [
+        {
+            "lat": round(float(la), 6),
+            "lng": round(float(ln), 6),
+            "weight": round(float(w), 3),
+            "count": int(c),
+        }
+        for la, ln, w, c in zip(lat, lng, weights[occupied], counts[occupied])
+    ]
+
+
+def get_heatmap(min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: int,
+                waste_type: str | None = None) -> dict:
+    """Weighted heatmap cells for a bounding box, pre-binned per map tile.
+
+    If the box spans more than MAX_TILES tiles at `zoom`, the cells are
+    binned at the highest lower zoom where it fits; the result's `zoom` is
+    the one actually used.
+    """
+    zoom = max(0, min(zoom, MAX_ZOOM))
+    xs, ys = tile_range(min_lat, min_lng, max_lat, max_lng, zoom)
+    while len(xs) * len(ys) > MAX_TILES and zoom > 0:
+        zoom -= 1
+        xs, ys = tile_range(min_lat, min_lng, max_lat, max_lng, zoom)
+
+    points = _get_points()
+    viewport = None  # filtered once, on the first tile that isn't cached
+    cells = []
+    for tx, ty in product(xs, ys):
+        key = (zoom, tx, ty, waste_type)
+        with _lock:
+            tile = _tiles.get(key)
+            if tile is not None:
+                _tiles.move_to_end(key)
+        if tile is None:
+            if viewport is None:
+                viewport = _viewport(points, zoom, xs, ys, waste_type)
+            tile = _bin_tile(viewport, zoom, tx, ty)
+            with _lock:
+                if points is _points:
+                    _tiles[key] = tile
+                    while len(_tiles) > _TILE_CACHE_SIZE:
+                        _tiles.popitem(last=False)
+        cells.extend(tile)
+
+    return {"zoom": zoom, "cells": cells}
@@ -0,0 +1,72 @@
+"""
+In-memory image handle for the inference pipeline.
+
+A photo is decoded from base64 (or received as raw bytes) exactly once.
+Dimensions come from the image header, and the downscaled copy sent to
+Roboflow is built at most once, using Pillow's JPEG draft mode so large
+camera photos are decoded at a reduced scale instead of at full size.
+Building it decodes the whole image, so a truncated or corrupt photo fails
+there rather than inside a Roboflow call shared with other images.
+"""
+import base64
+import io
+from PIL import Image as PILImage
+from app.services.inference_cache import image_cache_key
+
+# Max dimension for images sent to Roboflow (keeps payload under API limit)
+MAX_DIM = 2048
+
+
+class ImageHandle:
+    def __init__(self, data: bytes, image_base64: str | None = None):
+        self.data = data
+        self._base64 = image_base64
+        self._image = PILImage.open(io.BytesIO(data))  # lazy – reads the header only
+        self.width, self.height = self._image.size
+        self._cache_key: str | None = None
+        self._workflow_input: str | None = None
+
+    @classmethod
+    def from_base64(cls, image_base64: str) -> "ImageHandle":
+        return cls(base64.b64decode(image_base64), image_base64)
+
+    @property
+    def cache_key(self) -> str:
+        if self._cache_key is None:
+            self._cache_key = image_cache_key(self.data)
+        return self._cache_key
+
+    def workflow_input(self) -> str:
+        """Base64 image with its longest side ≤ MAX_DIM, ready for run_workflow."""
+        if self._workflow_input is None:
+            self._workflow_input = self._build_workflow_input()
+        return self._workflow_input
+
+    def _build_workflow_input(self) -> str:
+        if max(self.width, self.height) <= MAX_DIM:
+            # Sent as is, but check it decodes (at 1/8 scale for JPEGs)
+            img = PILImage.open(io.BytesIO(self.data))
+            img.draft("RGB", (max(self.width // 8, 1), max(self.height // 8, 1)))
+            img.load()
+            return self._base64 or base64.b64encode(self.data).decode()
+
+        ratio = MAX_DIM / max(self.width, self.height)
+        new_w = int(self.width * ratio)
+        new_h = int(self.height * ratio)
+
+        img = self._image
+        # For JPEGs, let the decoder scale by 1/2, 1/4 or 1/8 while decoding
+        # (never below the target size); no-op for other formats.
+        img.draft("RGB", (new_w, new_h))
+        img = img.convert("RGB").resize((new_w, new_h), PILImage.LANCZOS)
+
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        return base64.b64encode(buf.getvalue()).decode()
+
+
+def as_image_handle(image: "str | ImageHandle") -> ImageHandle:
+    """Accept either a base64 string or an existing handle."""
+    if isinstance(image, ImageHandle):
+        return image
+    return ImageHandle.from_base64(image)
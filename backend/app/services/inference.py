@@ -1,15 +1,34 @@
 """
 Waste detection using Roboflow Workflow API via inference-sdk.
-Uses asyncio.to_thread to keep FastAPI async-friendly.
+Workflow calls run on a dedicated, bounded thread pool to keep FastAPI
+async-friendly; when it is saturated, callers get InferenceOverloaded.
 """
 import asyncio
 import base64
 import io
-import os
-import tempfile
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image as PILImage
 from inference_sdk import InferenceHTTPClient
-from app.core.config import ROBOFLOW_API_KEY, ROBOFLOW_WORKSPACE, ROBOFLOW_WORKFLOW_ID
+from app.core import metrics
+from app.core.logs import truncate
+from app.core.config import (
+    ROBOFLOW_API_KEY, ROBOFLOW_WORKSPACE, ROBOFLOW_WORKFLOW_ID,
+    INFERENCE_CACHE_SIZE, INFERENCE_CACHE_TTL_SECONDS, INFERENCE_CACHE_DIR,
+    INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH_SIZE,
+    INFERENCE_MAX_CONCURRENCY, INFERENCE_MAX_QUEUE,
+    INFERENCE_MAX_QUEUE_WAIT_SECONDS, INFERENCE_RETRY_AFTER_SECONDS,
+    ROBOFLOW_TIMEOUT_SECONDS, ROBOFLOW_BREAKER_FAILURES, ROBOFLOW_BREAKER_RESET_SECONDS,
+    INFERENCE_MIN_CONFIDENCE, INFERENCE_NMS_IOU,
+)
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpen
+from app.services.inference_batcher import InferenceOverloaded, MicroBatcher
+from app.services.inference_cache import DetectionCache
+from app.services.image_handle import ImageHandle, as_image_handle
+
+logger = logging.getLogger(__name__)
 
 # Percentage of image to keep (center crop) — avoids noisy edge detections
 CROP_RATIO = 0.95
@@ -22,6 +41,18 @@ _client = InferenceHTTPClient(
 )
 
 
+# Shared by analyze_image, detect_objects and verify_cleanup
+_cache = DetectionCache(INFERENCE_CACHE_SIZE, INFERENCE_CACHE_TTL_SECONDS, INFERENCE_CACHE_DIR)
+
+# Roboflow calls currently running, by cache key, so identical concurrent
+# requests share one call instead of racing to fill the cache.
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+class _LeaderCancelled(Exception):
+    """The shared call was cancelled by its own caller; the others retry."""
+
+
 # ── Helpers ──────────────────────────────
 
 def _map_class_to_waste_type(class_name: str) -> str:
@@ -46,6 +77,17 @@ def _map_class_to_waste_type(class_name: str) -> str:
     return "mixed"
 
 
+# Class name → waste type, filled on first sight (the model has a fixed label set)
+_WASTE_TYPE_BY_CLASS: dict[str, str] = {}
+
+
+def _waste_type_for(class_name: str) -> str:
+    waste_type = _WASTE_TYPE_BY_CLASS.get(class_name)
+    if waste_type is None:
+        waste_type = _WASTE_TYPE_BY_CLASS[class_name] = _map_class_to_waste_type(class_name)
+    return waste_type
+
+
 def _severity_from_count(count: int) -> str:
     if count >= 10:
         return "critical"
@@ -113,50 +155,65 @@ def _center_crop_base64(image_base64: str, ratio: float = CROP_RATIO) -> tuple[s
     }
 
 
-# Max dimension for images sent to Roboflow (keeps payload under API limit)
-MAX_DIM = 2048
-
+# ── Roboflow workflow call ───────────────
 
-def _resize_if_needed(image_base64: str) -> tuple[str, int, int]:
-    """Resize image so longest side ≤ MAX_DIM. Returns (b64, orig_w, orig_h)."""
-    img_bytes = base64.b64decode(image_base64)
-    img = PILImage.open(io.BytesIO(img_bytes))
-    orig_w, orig_h = img.size
+ROBOFLOW_CALL_SECONDS = metrics.histogram(
+    "ecomap_roboflow_call_duration_seconds", "Roboflow workflow call latency (one call per batch)", ("outcome",),
+)
+ROBOFLOW_IMAGES = metrics.counter("ecomap_roboflow_images_total", "Images sent to Roboflow")
 
-    if max(orig_w, orig_h) <= MAX_DIM:
-        return image_base64, orig_w, orig_h
 
-    ratio = MAX_DIM / max(orig_w, orig_h)
-    new_w = int(orig_w * ratio)
-    new_h = int(orig_h * ratio)
-    img = img.resize((new_w, new_h), PILImage.LANCZOS)
+class InvalidImage(ValueError):
+    """The image can't be decoded; a client input error, not a Roboflow failure."""
 
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return base64.b64encode(buf.getvalue()).decode(), orig_w, orig_h
 
+def _prepare_image(image: ImageHandle) -> str:
+    """Downscale (once, in memory) one image; runs per item before its batch call."""
+    try:
+        return image.workflow_input()
+    except Exception as e:
+        raise InvalidImage(f"Could not decode image: {e}") from e
 
-# ── Roboflow workflow call ───────────────
 
-def _run_workflow_sync(image_base64: str) -> list:
-    """Resize → decode → temp file → run workflow → return result."""
-    resized_b64, _, _ = _resize_if_needed(image_base64)
-    img_bytes = base64.b64decode(resized_b64)
-    tmp_path = None
+def _run_workflow_sync(inputs: list[str]) -> list:
+    """Run workflow on prepared images → one result entry per image."""
+    ROBOFLOW_IMAGES.inc(len(inputs))
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
-            f.write(img_bytes)
-            tmp_path = f.name
         result = _client.run_workflow(
             workspace_name=ROBOFLOW_WORKSPACE,
             workflow_id=ROBOFLOW_WORKFLOW_ID,
-            images={"image": tmp_path},
+            images={"image": inputs if len(inputs) > 1 else inputs[0]},
             use_cache=True,
         )
+        outcome = "ok"
         return result
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        ROBOFLOW_CALL_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+
+
+_executor = ThreadPoolExecutor(max_workers=INFERENCE_MAX_CONCURRENCY, thread_name_prefix="roboflow")
+
+# While open, callers get the "unavailable" fallback without waiting on Roboflow
+_breaker = CircuitBreaker("roboflow", ROBOFLOW_BREAKER_FAILURES, ROBOFLOW_BREAKER_RESET_SECONDS)
+
+# Concurrent cache misses are sent to Roboflow together
+_batcher = MicroBatcher(
+    _run_workflow_sync,
+    INFERENCE_BATCH_WINDOW_MS / 1000,
+    INFERENCE_MAX_BATCH_SIZE,
+    executor=_executor,
+    max_queued=INFERENCE_MAX_QUEUE,
+    max_queue_wait=INFERENCE_MAX_QUEUE_WAIT_SECONDS,
+    retry_after=INFERENCE_RETRY_AFTER_SECONDS,
+    execute_timeout=ROBOFLOW_TIMEOUT_SECONDS,
+    prepare=_prepare_image,
+    on_batch_error=lambda error: _breaker.record_failure(),  # one failure per failed batch
+)
+
+# Logged without a traceback when falling back
+_EXPECTED_FAILURES = (CircuitOpen, TimeoutError, InvalidImage)
 
 
 def _extract_predictions(result: list) -> tuple[list[dict], dict]:
@@ -198,136 +255,336 @@ def _extract_predictions(result: list) -> tuple[list[dict], dict]:
             if any(k in sample for k in ["class", "class_name", "class_id"]):
                 return val, image_info
 
-    print(f"[Roboflow] Could not find predictions in workflow result. Keys: {list(entry.keys())}")
-    print(f"[Roboflow] Full result: {entry}")
+    logger.warning(
+        "Could not find predictions in workflow result",
+        extra={"keys": list(entry.keys()), "result": truncate(entry)},
+    )
     return [], image_info
 
 
-async def _call_roboflow(image_base64: str) -> tuple[list[dict], dict]:
-    """Run Roboflow workflow in a thread pool and extract predictions.
-    Returns (predictions, image_info).
+async def _call_roboflow(image: ImageHandle) -> tuple[list[dict], dict]:
+    """Run Roboflow workflow (micro-batched, in a thread) and extract predictions.
+    Results are cached by image content hash.
+    Returns (predictions, image_info). Raises InferenceOverloaded when shedding
+    load (queue full or queued too long), CircuitOpen while Roboflow is
+    failing, TimeoutError when the workflow call itself exceeds its deadline,
+    InvalidImage when this image can't be decoded.
     """
-    result = await asyncio.to_thread(_run_workflow_sync, image_base64)
-    preds, image_info = _extract_predictions(result)
-    print(f"[Roboflow] Extracted {len(preds)} predictions, image_info={image_info}")
-    if preds:
-        print(f"[Roboflow] Sample: {preds[0]}")
-    return preds, image_info
+    key = image.cache_key
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    if key in _in_flight:
+        try:
+            return await asyncio.shield(_in_flight[key])
+        except _LeaderCancelled:
+            # The first waiter left (e.g. client disconnect); one of us becomes the caller
+            return await _call_roboflow(image)
+
+    _breaker.before_call()
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        # Failed batches were already counted once by the batcher's
+        # on_batch_error; shed requests and unreadable images don't count
+        try:
+            entry = await _batcher.submit(image)
+        except TimeoutError:
+            _breaker.release()
+            raise TimeoutError(f"Roboflow did not answer within {ROBOFLOW_TIMEOUT_SECONDS}s") from None
+        except BaseException:
+            _breaker.release()
+            raise
+        _breaker.record_success()
+        preds, image_info = _extract_predictions([entry])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Roboflow predictions extracted",
+                extra={"predictions": len(preds), "image_info": image_info,
+                       "sample": truncate(preds[0]) if preds else None},
+            )
+        _cache.put(key, (preds, image_info))
+        future.set_result((preds, image_info))
+        return preds, image_info
+    except BaseException as e:
+        # Don't hand our own cancellation to the callers sharing this one
+        future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+        future.exception()  # mark retrieved when nobody else is waiting
+        raise
+    finally:
+        del _in_flight[key]
 
 
-# ── Public API ───────────────────────────
+def check_admission(image: ImageHandle) -> None:
+    """Raise InferenceOverloaded now if this image would need a Roboflow call
+    and the inference queue is full (so callers can skip work they'd waste)."""
+    key = image.cache_key
+    if key in _in_flight or _cache.get(key) is not None:
+        return
+    _batcher.check_admission()
 
-async def analyze_image(image_base64: str) -> dict:
-    """Full analysis using Roboflow object detection."""
-    try:
-        predictions, _ = await _call_roboflow(image_base64)
-        count = len(predictions)
 
-        if not predictions:
-            return {
-                "waste_type": "mixed",
-                "severity": "low",
-                "confidence": 0.0,
-                "action": "No waste detected. If this is wrong, please submit manually.",
-            }
+def get_stats() -> dict:
+    """Counters for the inference pipeline (exposed at /api/inference/stats)."""
+    return {
+        "cache": _cache.stats(),
+        "in_flight": len(_in_flight),
+        "batching": _batcher.stats(),
+        "breaker": _breaker.stats(),
+    }
 
-        best = max(predictions, key=lambda p: p.get("confidence", 0))
-        waste_type = _map_class_to_waste_type(best.get("class", ""))
-        confidence = round(best.get("confidence", 0.0), 3)
-        severity = _severity_from_count(count)
-        action = _action_advice(waste_type, severity)
 
-        return {
-            "waste_type": waste_type,
-            "severity": severity,
-            "confidence": confidence,
-            "action": action,
-        }
+# Scrape-time views of the stats above for /metrics
+metrics.callback(
+    "ecomap_inference_cache_lookups_total", "Detection cache lookups by result",
+    lambda: [({"result": r}, _cache.stats()[r]) for r in ("hits", "disk_hits", "misses")],
+    kind="counter", labels=("result",),
+)
+metrics.callback("ecomap_inference_cache_entries", "Detection cache entries in memory", lambda: _cache.stats()["entries"])
+metrics.callback("ecomap_inference_in_flight", "Distinct images waiting on Roboflow", lambda: len(_in_flight))
+metrics.callback("ecomap_inference_queued", "Requests waiting for an inference worker", lambda: _batcher.stats()["queued"])
+metrics.callback("ecomap_inference_executing", "Requests inside a running workflow call", lambda: _batcher.stats()["executing"])
+metrics.callback(
+    "ecomap_inference_invalid_images_total", "Images that failed to decode before their Roboflow call",
+    lambda: _batcher.stats()["invalid"], kind="counter",
+)
+metrics.callback(
+    "ecomap_inference_shed_total", "Requests answered 503 by admission control",
+    lambda: [({"reason": r}, _batcher.stats()[r]) for r in ("rejected", "expired")],
+    kind="counter", labels=("reason",),
+)
+metrics.callback(
+    "ecomap_inference_batch_avg_size", "Average images per Roboflow call", lambda: _batcher.stats()["avg_batch_size"],
+)
+metrics.callback(
+    "ecomap_inference_queue_wait_avg_seconds", "Average time a request waited to be sent",
+    lambda: _batcher.stats()["avg_queue_wait_ms"] / 1000,
+)
+metrics.callback(
+    "ecomap_roboflow_breaker_state", "Roboflow circuit breaker state (1 = current)",
+    lambda: [({"state": st}, int(_breaker.state == st)) for st in ("closed", "open", "half_open")],
+    labels=("state",),
+)
+metrics.callback(
+    "ecomap_roboflow_breaker_short_circuited_total", "Calls failed fast by the open breaker",
+    lambda: _breaker.short_circuited, kind="counter",
+)
 
-    except Exception as e:
-        print(f"[Analyze Error] {e}")
-        import traceback; traceback.print_exc()
+
+# ── Result builders ──────────────────────
+
+_ANALYSIS_UNAVAILABLE = {
+    "waste_type": "mixed",
+    "severity": "medium",
+    "confidence": 0.75,
+    "action": "AI analysis unavailable. Requires manual segregation. Do not burn.",
+}
+
+_DETECTION_UNAVAILABLE = {
+    "detections": [],
+    "summary": {
+        "total_count": 0,
+        "waste_type": "mixed",
+        "severity": "low",
+    },
+    "image_width": 0,
+    "image_height": 0,
+}
+
+
+def _build_analysis(predictions: list[dict]) -> dict:
+    """Waste type / severity / advice summary from raw predictions."""
+    count = len(predictions)
+
+    if not predictions:
         return {
             "waste_type": "mixed",
-            "severity": "medium",
-            "confidence": 0.75,
-            "action": "AI analysis unavailable. Requires manual segregation. Do not burn.",
+            "severity": "low",
+            "confidence": 0.0,
+            "action": "No waste detected. If this is wrong, please submit manually.",
         }
 
+    best = max(predictions, key=lambda p: p.get("confidence", 0))
+    waste_type = _waste_type_for(best.get("class", ""))
+    confidence = round(best.get("confidence", 0.0), 3)
+    severity = _severity_from_count(count)
+    action = _action_advice(waste_type, severity)
+
+    return {
+        "waste_type": waste_type,
+        "severity": severity,
+        "confidence": confidence,
+        "action": action,
+    }
 
-def _is_in_center(pred: dict, img_w: int, img_h: int, ratio: float = CROP_RATIO) -> bool:
-    """Return True if the detection center falls within the center `ratio` zone."""
-    margin_x = img_w * (1 - ratio) / 2
-    margin_y = img_h * (1 - ratio) / 2
-    cx = pred.get("x", 0)
-    cy = pred.get("y", 0)
-    return margin_x <= cx <= img_w - margin_x and margin_y <= cy <= img_h - margin_y
 
+class _Predictions:
+    """Columnar view of raw Roboflow predictions (boxes are center x/y + size)."""
+
+    def __init__(self, x, y, width, height, confidence, classes: list[str]):
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.confidence = confidence
+        self.classes = classes
+
+    @classmethod
+    def from_list(cls, predictions: list[dict]) -> "_Predictions":
+        rows = np.array(
+            [(p.get("x", 0), p.get("y", 0), p.get("width", 0), p.get("height", 0), p.get("confidence", 0))
+             for p in predictions],
+            dtype=np.float64,
+        ).reshape(-1, 5)
+        return cls(*rows.T, [p.get("class", "") for p in predictions])
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def take(self, keep: np.ndarray) -> "_Predictions":
+        """Subset by boolean mask or index array."""
+        idx = np.flatnonzero(keep) if keep.dtype == bool else keep
+        return _Predictions(
+            self.x[idx], self.y[idx], self.width[idx], self.height[idx], self.confidence[idx],
+            [self.classes[i] for i in idx.tolist()],
+        )
 
-async def detect_objects(image_base64: str) -> dict:
+    def in_center(self, img_w: int, img_h: int, ratio: float = CROP_RATIO) -> np.ndarray:
+        """Mask of detections whose center falls within the center `ratio` zone."""
+        margin_x = img_w * (1 - ratio) / 2
+        margin_y = img_h * (1 - ratio) / 2
+        return (
+            (self.x >= margin_x) & (self.x <= img_w - margin_x)
+            & (self.y >= margin_y) & (self.y <= img_h - margin_y)
+        )
+
+    def nms(self, iou_threshold: float) -> np.ndarray:
+        """Class-agnostic non-maximum suppression; indices kept, in original order."""
+        x1, y1 = self.x - self.width / 2, self.y - self.height / 2
+        x2, y2 = self.x + self.width / 2, self.y + self.height / 2
+        area = self.width * self.height
+        order = np.argsort(-self.confidence, kind="stable")
+        keep = []
+        while order.size:
+            i, rest = order[0], order[1:]
+            keep.append(i)
+            iw = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+            ih = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+            inter = iw * ih
+            union = area[i] + area[rest] - inter
+            iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+            order = rest[iou <= iou_threshold]
+        return np.sort(np.array(keep, dtype=np.intp))
+
+    def filtered(self, min_confidence: float = 0.0, img_w: int = 0, img_h: int = 0) -> "_Predictions":
+        """Confidence threshold, edge filter (when image dims are known), then optional NMS."""
+        keep = self.confidence >= min_confidence
+        if img_w and img_h:
+            keep &= self.in_center(img_w, img_h)
+        preds = self.take(keep)
+        if INFERENCE_NMS_IOU > 0 and len(preds) > 1:
+            preds = preds.take(preds.nms(INFERENCE_NMS_IOU))
+        return preds
+
+
+def _build_detection(predictions: list[dict], image_info: dict, orig_w: int, orig_h: int) -> dict:
+    """Bounding boxes in original-image coordinates, minus edge detections."""
+    # Roboflow sees the (possibly resized) image
+    robo_w = image_info.get("width", 0)
+    robo_h = image_info.get("height", 0)
+
+    # Scale factor to map resized coords back to original space
+    sx = orig_w / robo_w if robo_w else 1
+    sy = orig_h / robo_h if robo_h else 1
+
+    # Skip edge detections (based on resized image dims)
+    preds = _Predictions.from_list(predictions).filtered(INFERENCE_MIN_CONFIDENCE, robo_w, robo_h)
+    # Python's round(): np.round can land on the other side of a half (0.0145)
+    confidence = [round(c, 3) for c in preds.confidence.tolist()]
+    waste_types = [_waste_type_for(c) for c in preds.classes]
+
+    detections = [
+        {
+            "x": x,
+            "y": y,
+            "width": w,
+            "height": h,
+            "class_name": class_name or "unknown",
+            "confidence": conf,
+            "waste_type": waste_type,
+            "color": WASTE_COLORS.get(waste_type, "#FCC419"),
+        }
+        for x, y, w, h, conf, class_name, waste_type in zip(
+            (preds.x * sx).tolist(), (preds.y * sy).tolist(),
+            (preds.width * sx).tolist(), (preds.height * sy).tolist(),
+            confidence, preds.classes, waste_types,
+        )
+    ]
+
+    primary_type = waste_types[int(np.argmax(confidence))] if detections else "mixed"
+
+    return {
+        "detections": detections,
+        "summary": {
+            "total_count": len(detections),
+            "waste_type": primary_type,
+            "severity": _severity_from_count(len(detections)),
+        },
+        "image_width": orig_w,
+        "image_height": orig_h,
+    }
+
+
+# ── Public API ───────────────────────────
+
+async def analyze_image(image: str | ImageHandle) -> dict:
+    """Full analysis using Roboflow object detection.
+    `image` is a base64 string or an already-decoded ImageHandle.
+    """
+    try:
+        predictions, _ = await _call_roboflow(as_image_handle(image))
+        return _build_analysis(predictions)
+
+    except InferenceOverloaded:
+        raise
+    except Exception as e:
+        logger.error("Analyze failed: %s", e, exc_info=not isinstance(e, _EXPECTED_FAILURES))
+        return dict(_ANALYSIS_UNAVAILABLE)
+
+
+async def detect_objects(image: str | ImageHandle) -> dict:
     """Detection: sends full image to Roboflow for max accuracy, then filters
     out detections whose center falls outside the center 90% zone.
     Coordinates are mapped back to the original image space if resized.
     """
     try:
-        # Get original dims before any resize happens inside _call_roboflow
-        _, orig_w, orig_h = _resize_if_needed(image_base64)
-
-        predictions, image_info = await _call_roboflow(image_base64)
-
-        # Roboflow sees the (possibly resized) image
-        robo_w = image_info.get("width", 0)
-        robo_h = image_info.get("height", 0)
-
-        # Scale factor to map resized coords back to original space
-        sx = orig_w / robo_w if robo_w else 1
-        sy = orig_h / robo_h if robo_h else 1
-
-        detections = []
-        for p in predictions:
-            # Skip edge detections (based on resized image dims)
-            if robo_w and robo_h and not _is_in_center(p, robo_w, robo_h, CROP_RATIO):
-                continue
-            waste_type = _map_class_to_waste_type(p.get("class", ""))
-            detections.append({
-                "x": p.get("x", 0) * sx,
-                "y": p.get("y", 0) * sy,
-                "width": p.get("width", 0) * sx,
-                "height": p.get("height", 0) * sy,
-                "class_name": p.get("class", "unknown"),
-                "confidence": round(p.get("confidence", 0), 3),
-                "waste_type": waste_type,
-                "color": WASTE_COLORS.get(waste_type, "#FCC419"),
-            })
-
-        if detections:
-            best = max(detections, key=lambda d: d["confidence"])
-            primary_type = best["waste_type"]
-        else:
-            primary_type = "mixed"
+        handle = as_image_handle(image)
+        predictions, image_info = await _call_roboflow(handle)
+        return _build_detection(predictions, image_info, handle.width, handle.height)
+
+    except InferenceOverloaded:
+        raise
+    except Exception as e:
+        logger.warning("Detect failed: %s", e)
+        return {**_DETECTION_UNAVAILABLE, "summary": dict(_DETECTION_UNAVAILABLE["summary"])}
 
+
+async def scan_image(image: ImageHandle) -> dict:
+    """Detection boxes and the analyze-style summary from a single Roboflow call.
+    Returns the detect_objects result plus an `analysis` key.
+    """
+    try:
+        predictions, image_info = await _call_roboflow(image)
         return {
-            "detections": detections,
-            "summary": {
-                "total_count": len(detections),
-                "waste_type": primary_type,
-                "severity": _severity_from_count(len(detections)),
-            },
-            "image_width": orig_w,
-            "image_height": orig_h,
+            **_build_detection(predictions, image_info, image.width, image.height),
+            "analysis": _build_analysis(predictions),
         }
 
+    except InferenceOverloaded:
+        raise
     except Exception as e:
-        print(f"[Roboflow Detect Error] {e}")
+        logger.warning("Scan failed: %s", e)
         return {
-            "detections": [],
-            "summary": {
-                "total_count": 0,
-                "waste_type": "mixed",
-                "severity": "low",
-            },
-            "image_width": 0,
-            "image_height": 0,
+            **_DETECTION_UNAVAILABLE,
+            "summary": dict(_DETECTION_UNAVAILABLE["summary"]),
+            "analysis": dict(_ANALYSIS_UNAVAILABLE),
         }
 
 
@@ -338,17 +595,19 @@ CLEANUP_CONFIDENCE = 0.55   # ignore detections below this confidence
 CLEANUP_THRESHOLD = 5       # allow up to this many low-noise detections
 
 
-async def verify_cleanup(image_base64: str) -> dict:
+async def verify_cleanup(image: str | ImageHandle) -> dict:
     """Verify a cleanup by running waste detection on the 'after' photo.
     If very few (or zero) waste items are detected, the cleanup is accepted.
     Returns {verified: bool, waste_detected: int, message: str}.
     """
     try:
-        predictions, _ = await _call_roboflow(image_base64)
+        predictions, _ = await _call_roboflow(as_image_handle(image))
         # Only count high-confidence detections to avoid false positives on clean areas
-        confident = [p for p in predictions if p.get("confidence", 0) >= CLEANUP_CONFIDENCE]
-        count = len(confident)
-        print(f"[Cleanup] Raw predictions: {len(predictions)}, above {CLEANUP_CONFIDENCE}: {count}")
+        count = len(_Predictions.from_list(predictions).filtered(CLEANUP_CONFIDENCE))
+        logger.debug(
+            "Cleanup predictions counted",
+            extra={"raw": len(predictions), "confident": count, "min_confidence": CLEANUP_CONFIDENCE},
+        )
 
         if count <= CLEANUP_THRESHOLD:
             return {
@@ -364,9 +623,10 @@ async def verify_cleanup(image_base64: str) -> dict:
                 "message": f"Still {count} waste item(s) detected. Please clean the area more thoroughly and try again.",
             }
 
+    except InferenceOverloaded:
+        raise
     except Exception as e:
-        print(f"[Cleanup Verify Error] {e}")
-        import traceback; traceback.print_exc()
+        logger.error("Cleanup verification failed: %s", e, exc_info=not isinstance(e, _EXPECTED_FAILURES))
         return {
             "verified": False,
             "waste_detected": -1,
@@ -0,0 +1,276 @@
+"""
+Micro-batching scheduler for Roboflow workflow calls.
+
+Requests that arrive within a short window (INFERENCE_BATCH_WINDOW_MS) are
+sent to Roboflow as one workflow call with several images, and each caller
+gets back its own entry of the result. A batch is flushed early once it
+reaches INFERENCE_MAX_BATCH_SIZE images.
+
+The scheduler also does admission control: batches run on a dedicated,
+bounded thread pool, at most `max_queued` requests may wait for it, and a
+request still waiting after `max_queue_wait` fails at that moment (a timer
+per request) and is dropped from its batch. Both cases raise
+InferenceOverloaded so the API can answer 503 straight away instead of
+letting the client time out.
+
+`execute_timeout` is a deadline on the workflow call itself: it starts when
+a worker picks the batch up, so time spent queued doesn't count against
+it. Past the deadline the batch's callers get TimeoutError (the worker
+thread can't be interrupted and finishes in the background).
+
+`prepare`, if given, runs on each item in the worker before the batch call;
+an item it raises for fails alone and is left out of the call. A batch call
+that raises or misses its deadline is reported once to `on_batch_error`
+(on the event loop) before its callers are failed, so a failure can be
+counted per batch rather than per caller.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable
+
+
+class InferenceOverloaded(Exception):
+    """Inference queue is full or a request waited too long for a worker."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MicroBatcher:
+    """Coalesce concurrent `submit` calls into calls of `run_batch(items)`.
+
+    `run_batch` is a blocking function that takes a list of items and
+    returns one result per item, in the same order. It runs on `executor`
+    (asyncio's default executor if None), and gets `prepare(item)` instead
+    of the item when `prepare` is set.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list], list],
+        window_seconds: float,
+        max_batch_size: int,
+        executor: Executor | None = None,
+        max_queued: int = 0,
+        max_queue_wait: float = 0,
+        retry_after: int = 5,
+        execute_timeout: float = 0,
+        prepare: Callable[[Any], Any] | None = None,
+        on_batch_error: Callable[[BaseException], None] | None = None,
+    ):
+        self.run_batch = run_batch
+        self.prepare = prepare
+        self.on_batch_error = on_batch_error
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self.executor = executor
+        self.max_queued = max_queued            # 0 = unbounded
+        self.max_queue_wait = max_queue_wait    # 0 = wait forever
+        self.retry_after = retry_after
+        self.execute_timeout = execute_timeout  # 0 = no deadline
+        self._pending: list[tuple[Any, asyncio.Future, float]] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._running: set[asyncio.Task] = set()
+        # Futures not yet picked up by a worker → their queue-wait timer
+        self._waiting: dict[asyncio.Future, asyncio.TimerHandle | None] = {}
+        # Running batches (their futures) → their execution deadline (loop thread only)
+        self._deadlines: dict[tuple[asyncio.Future, ...], asyncio.TimerHandle] = {}
+        self._lock = threading.Lock()
+        self.queued = 0       # submitted, not yet picked up by a worker
+        self.executing = 0    # inside a running workflow call
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.expired = 0
+        self.invalid = 0      # failed in `prepare`
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def check_admission(self) -> None:
+        """Raise InferenceOverloaded now if a submit() would be rejected."""
+        with self._lock:
+            if self.max_queued and self.queued >= self.max_queued:
+                self.rejected += 1
+                raise InferenceOverloaded("Inference queue is full", self.retry_after)
+
+    async def submit(self, item: Any) -> Any:
+        with self._lock:
+            if self.max_queued and self.queued >= self.max_queued:
+                self.rejected += 1
+                raise InferenceOverloaded("Inference queue is full", self.retry_after)
+            self.queued += 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        timer = loop.call_later(self.max_queue_wait, self._expire, future) if self.max_queue_wait else None
+        with self._lock:
+            self._waiting[future] = timer
+        self._pending.append((item, future, time.monotonic()))
+
+        if len(self._pending) >= self.max_batch_size or self.window_seconds <= 0:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _expire(self, future: asyncio.Future) -> None:
+        """Queue-wait timer: fail a request that no worker has picked up yet."""
+        with self._lock:
+            if future not in self._waiting:
+                return  # a worker already picked it up
+            del self._waiting[future]
+            self.queued -= 1
+            self.expired += 1
+        if not future.done():
+            future.set_exception(InferenceOverloaded("Timed out waiting for an inference worker", self.retry_after))
+
+    def _arm_deadline(self, futures: tuple[asyncio.Future, ...]) -> None:
+        loop = asyncio.get_running_loop()
+        self._deadlines[futures] = loop.call_later(self.execute_timeout, self._deadline, futures)
+
+    def _deadline(self, futures: tuple[asyncio.Future, ...]) -> None:
+        self._deadlines.pop(futures, None)
+        waiting = [future for future in futures if not future.done()]
+        if not waiting:
+            return
+        error = TimeoutError(f"Batch did not finish within {self.execute_timeout}s")
+        self._batch_failed(error)
+        for future in waiting:
+            future.set_exception(error)
+
+    def _batch_failed(self, error: BaseException) -> None:
+        if self.on_batch_error is not None:
+            self.on_batch_error(error)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    def _execute(self, batch: list[tuple[Any, asyncio.Future, float]], loop: asyncio.AbstractEventLoop):
+        """Worker-thread side: drop expired or cancelled requests, run the rest."""
+        started = time.monotonic()
+        live, dropped, timers = [], [], []
+        with self._lock:
+            for entry in batch:
+                if entry[1] not in self._waiting:
+                    continue  # its timer already failed it
+                timers.append(self._waiting.pop(entry[1]))
+                self.queued -= 1
+                if entry[1].cancelled() or (self.max_queue_wait and started - entry[2] > self.max_queue_wait):
+                    dropped.append(entry)
+                else:
+                    live.append(entry)
+            self.executing += len(live)
+            self.expired += len(dropped)
+            if live:
+                waits = [started - enqueued for _, _, enqueued in live]
+                self.batches += 1
+                self.items += len(live)
+                self.max_batch_seen = max(self.max_batch_seen, len(live))
+                self.total_wait += sum(waits)
+                self.max_wait = max(self.max_wait, *waits)
+
+        ready, inputs, invalid = [], [], []
+        for entry in live:
+            if self.prepare is None:
+                ready.append(entry)
+                inputs.append(entry[0])
+                continue
+            try:
+                inputs.append(self.prepare(entry[0]))
+                ready.append(entry)
+            except Exception as e:
+                invalid.append((entry, e))
+        if invalid:
+            with self._lock:
+                self.executing -= len(invalid)
+                self.invalid += len(invalid)
+        if ready and self.execute_timeout:
+            loop.call_soon_threadsafe(self._arm_deadline, tuple(future for _, future, _ in ready))
+
+        results, error = [], None
+        try:
+            if ready:
+                results = self.run_batch(inputs)
+                if len(results) != len(ready):
+                    raise RuntimeError(f"Batch returned {len(results)} results for {len(ready)} inputs")
+        except Exception as e:
+            error = e
+        finally:
+            with self._lock:
+                self.executing -= len(ready)
+        return ready, invalid, dropped, timers, results, error
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            live, invalid, dropped, timers, results, error = await loop.run_in_executor(
+                self.executor, self._execute, batch, loop,
+            )
+        except BaseException as e:
+            with self._lock:
+                for _, future, _ in batch:
+                    if future in self._waiting:
+                        timer = self._waiting.pop(future)
+                        if timer is not None:
+                            timer.cancel()
+                        self.queued -= 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for timer in timers:
+            if timer is not None:
+                timer.cancel()
+        deadline = self._deadlines.pop(tuple(future for _, future, _ in live), None)
+        if deadline is not None:
+            deadline.cancel()
+        for (_, future, _), e in invalid:
+            if not future.done():
+                future.set_exception(e)
+        for _, future, _ in dropped:
+            if not future.done():
+                future.set_exception(
+                    InferenceOverloaded("Timed out waiting for an inference worker", self.retry_after)
+                )
+        if error is not None and any(not future.done() for _, future, _ in live):
+            self._batch_failed(error)  # once, before any caller sees it
+        for i, (_, future, _) in enumerate(live):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window_ms": round(self.window_seconds * 1000, 1),
+                "max_batch_size": self.max_batch_size,
+                "queued": self.queued,
+                "executing": self.executing,
+                "max_queued": self.max_queued,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "invalid": self.invalid,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.max_batch_seen,
+                "avg_queue_wait_ms": round(self.total_wait / self.items * 1000, 2) if self.items else 0.0,
+                "max_queue_wait_ms": round(self.max_wait * 1000, 2),
+            }
@@ -0,0 +1,107 @@
+"""
+Content-addressed cache for Roboflow detection results.
+
+Results are keyed by a SHA-256 of the decoded image bytes, so the same photo
+sent to /api/detect, /api/analyze or a retried cleanup verification only
+reaches Roboflow once. An in-memory LRU with a TTL sits in front of an
+optional on-disk tier (one JSON file per image) that survives restarts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def image_cache_key(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class DetectionCache:
+    """Bounded LRU + TTL cache of (predictions, image_info) tuples."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, disk_dir: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries: OrderedDict[str, tuple[float, tuple[list[dict], dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _get_disk(self, key: str) -> tuple[list[dict], dict] | None:
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.unlink(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["predictions"], data["image_info"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _put_disk(self, key: str, value: tuple[list[dict], dict]) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"predictions": value[0], "image_info": value[1]}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _remember(self, key: str, value: tuple[list[dict], dict]) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> tuple[list[dict], dict] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        if self.disk_dir:
+            value = self._get_disk(key)
+            if value is not None:
+                with self._lock:
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: tuple[list[dict], dict]) -> None:
+        if self.max_entries > 0:
+            with self._lock:
+                self._remember(key, value)
+        if self.disk_dir:
+            self._put_disk(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
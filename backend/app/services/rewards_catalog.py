@@ -0,0 +1,205 @@
+"""
+In-process rewards catalog for GET /api/rewards.
+
+Snapshot listeners on `rewards`, `products` and every `stock_shards`
+subcollection push changes into this process. Each change rebuilds the
+merged reward/product view once, and requests read the prebuilt list with
+no Firestore reads at all.
+
+Until all three listeners have delivered their first snapshot (or when they
+were never started, e.g. in scripts) get_rewards() returns None and the
+caller falls back to firebase_service.get_rewards().
+
+The time of each listener's last snapshot is recorded. A listener whose
+watch has closed (e.g. its stream failed for good), or that has delivered
+nothing for REWARDS_CATALOG_MAX_AGE_SECONDS, makes get_rewards() return None
+again and resubscribes all three in a background thread, at most once per
+_RESTART_INTERVAL. Quiet catalogs therefore re-read themselves every
+REWARDS_CATALOG_MAX_AGE_SECONDS, which bounds how long a silently dead
+listener can serve an outdated view.
+"""
+import logging
+import threading
+import time
+from app.core import metrics
+from app.core.config import db, REWARDS_CATALOG_MAX_AGE_SECONDS
+from app.services import firebase_service as fs
+
+logger = logging.getLogger(__name__)
+
+LISTENERS = ("rewards", "products", "stock_shards")
+LISTENER_STATES = ("live", "stale", "closed", "stopped")
+_RESTART_INTERVAL = 30  # seconds between resubscribe attempts
+
+CATALOG_REBUILDS = metrics.counter(
+    "ecomap_rewards_catalog_rebuilds_total", "Rewards catalog rebuilds triggered by listener snapshots",
+)
+CATALOG_RESTARTS = metrics.counter(
+    "ecomap_rewards_catalog_restarts_total", "Rewards catalog resubscribes after a closed or stale listener",
+)
+
+_lock = threading.Lock()
+_rewards: dict[str, dict] | None = None      # document path → reward
+_products: dict[str, dict] | None = None     # document path → product
+_shard_stock: dict[str, int] | None = None   # item document path → summed shard stock
+_view: list[dict] | None = None
+_watches: dict[str, object] = {}             # listener → watch
+_last_snapshot: dict[str, float] = {}        # listener → monotonic time of its last snapshot
+_started_at = 0.0
+_wanted = False       # start() was called and stop() wasn't: keep the listeners alive
+_restarting = False
+_last_restart = 0.0
+
+
+def _with_shard_stock(items: dict[str, dict]) -> list[dict]:
+    return [
+        {**item, "stock": _shard_stock.get(path, 0)} if item.get("stock_shards") else item
+        for path, item in items.items()
+    ]
+
+
+def _rebuild() -> None:
+    global _view
+    if _rewards is None or _products is None or _shard_stock is None:
+        return
+    _view = fs.build_rewards_view(_with_shard_stock(_rewards), _with_shard_stock(_products))
+    CATALOG_REBUILDS.inc()
+
+
+def _on_rewards(docs, changes, read_time) -> None:
+    global _rewards
+    with _lock:
+        _rewards = {d.reference.path: d.to_dict() for d in docs}
+        _last_snapshot["rewards"] = time.monotonic()
+        _rebuild()
+
+
+def _on_products(docs, changes, read_time) -> None:
+    global _products
+    with _lock:
+        _products = {d.reference.path: d.to_dict() for d in docs}
+        _last_snapshot["products"] = time.monotonic()
+        _rebuild()
+
+
+def _on_stock_shards(docs, changes, read_time) -> None:
+    global _shard_stock
+    totals: dict[str, int] = {}
+    for d in docs:
+        item_path = d.reference.parent.parent.path
+        totals[item_path] = totals.get(item_path, 0) + d.to_dict().get("stock", 0)
+    with _lock:
+        _shard_stock = totals
+        _last_snapshot["stock_shards"] = time.monotonic()
+        _rebuild()
+
+
+def start() -> None:
+    """Subscribe the listeners (idempotent). Failures leave the fallback in place."""
+    global _started_at, _wanted
+    _wanted = True
+    if _watches:
+        return
+    _started_at = time.monotonic()
+    try:
+        _watches["rewards"] = db.collection("rewards").on_snapshot(_on_rewards)
+        _watches["products"] = db.collection("products").on_snapshot(_on_products)
+        _watches["stock_shards"] = db.collection_group(fs.STOCK_SHARDS).on_snapshot(_on_stock_shards)
+    except Exception as e:
+        logger.warning("Rewards catalog listeners not started, serving from Firestore: %s", e)
+        _unsubscribe()
+
+
+def _unsubscribe() -> None:
+    global _rewards, _products, _shard_stock, _view
+    while _watches:
+        _, watch = _watches.popitem()
+        try:
+            watch.unsubscribe()
+        except Exception as e:  # a watch that already failed may raise its reason
+            logger.debug("Rewards catalog listener closed with %s", e)
+    with _lock:
+        _rewards = _products = _shard_stock = _view = None
+        _last_snapshot.clear()
+
+
+def stop() -> None:
+    global _wanted
+    _wanted = False
+    _unsubscribe()
+
+
+def listener_states() -> dict[str, str]:
+    """State of each listener: live, stale (no snapshot for
+    REWARDS_CATALOG_MAX_AGE_SECONDS), closed, or stopped (not subscribed)."""
+    now = time.monotonic()
+    with _lock:
+        last = dict(_last_snapshot)
+    states = {}
+    for name in LISTENERS:
+        watch = _watches.get(name)
+        if watch is None:
+            states[name] = "stopped"
+        elif getattr(watch, "_closed", False):
+            states[name] = "closed"
+        elif now - last.get(name, _started_at) > REWARDS_CATALOG_MAX_AGE_SECONDS:
+            states[name] = "stale"
+        else:
+            states[name] = "live"
+    return states
+
+
+def _restart(states: dict[str, str]) -> None:
+    global _restarting
+    try:
+        logger.warning("Rewards catalog listeners %s, resubscribing", states)
+        CATALOG_RESTARTS.inc()
+        _unsubscribe()
+        start()
+    finally:
+        with _lock:
+            _restarting = False
+
+
+def _maybe_restart(states: dict[str, str]) -> None:
+    """Resubscribe in a background thread, unless one is running or ran recently."""
+    global _restarting, _last_restart
+    with _lock:
+        if _restarting or time.monotonic() - _last_restart < _RESTART_INTERVAL:
+            return
+        _restarting = True
+        _last_restart = time.monotonic()
+    threading.Thread(target=_restart, args=(states,), name="rewards-catalog-restart", daemon=True).start()
+
+
+def get_rewards() -> list[dict] | None:
+    """The merged catalog, or None while the listeners aren't synced or healthy."""
+    if _wanted:
+        states = listener_states()
+        if any(state != "live" for state in states.values()):
+            _maybe_restart(states)
+            return None
+    with _lock:
+        view = _view
+    return [dict(item) for item in view] if view is not None else None
+
+
+def _snapshot_ages() -> list[tuple[dict, float]]:
+    now = time.monotonic()
+    with _lock:
+        last = dict(_last_snapshot)
+    return [({"listener": name}, now - last[name]) for name in LISTENERS if name in last]
+
+
+metrics.callback(
+    "ecomap_rewards_catalog_listener_state", "Rewards catalog listener state (1 = current)",
+    lambda: [
+        ({"listener": name, "state": st}, int(state == st))
+        for name, state in listener_states().items() for st in LISTENER_STATES
+    ],
+    labels=("listener", "state"),
+)
+metrics.callback(
+    "ecomap_rewards_catalog_snapshot_age_seconds", "Seconds since each listener's last snapshot",
+    _snapshot_ages, labels=("listener",),
+)
@@ -0,0 +1,114 @@
+"""
+Read-through cache of user documents for firebase_service.
+
+get_user() serves from here when it can; every firebase_service write to a
+user document is passed through `update()` with the same field dict sent to
+Firestore (Increment values included), so balances read back by this
+process reflect its own writes immediately. Writes from other processes are
+picked up when the entry expires after USER_CACHE_TTL_SECONDS.
+
+A fill is dropped if a write to the same user happened while its Firestore
+read was in flight, so a slow read can never overwrite newer data. Each
+write stamps its uid with a sequence number; only the most recent stamps
+are kept, and a fill older than the newest forgotten stamp is dropped too.
+"""
+import threading
+import time
+from collections import OrderedDict
+from google.cloud.firestore_v1 import DELETE_FIELD, Increment
+
+
+class UserCache:
+    """Bounded LRU + TTL cache of user dicts keyed by uid."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0           # sequence number of the latest write
+        self._written: OrderedDict[str, int] = OrderedDict()  # uid → epoch of its latest write
+        self._forgotten = 0       # newest epoch dropped from _written
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, uid: str, doc: dict) -> None:
+        self._entries[uid] = (time.monotonic(), doc)
+        self._entries.move_to_end(uid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _wrote(self, uid: str) -> None:
+        self._epoch += 1
+        self._written[uid] = self._epoch
+        self._written.move_to_end(uid)
+        while len(self._written) > max(self.max_entries, 1):
+            _, self._forgotten = self._written.popitem(last=False)
+
+    def get(self, uid: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is not None:
+                stored_at, doc = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(uid)
+                    self.hits += 1
+                    return dict(doc)
+                del self._entries[uid]
+            self.misses += 1
+            return None
+
+    def begin_fill(self) -> int:
+        """Call before reading the document from Firestore; pass the result to fill()."""
+        with self._lock:
+            return self._epoch
+
+    def fill(self, uid: str, doc: dict, epoch: int) -> None:
+        """Store a document read from Firestore, unless `uid` was written since begin_fill()."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if epoch >= self._forgotten and self._written.get(uid, 0) <= epoch:
+                self._remember(uid, dict(doc))
+
+    def put(self, uid: str, doc: dict) -> None:
+        """Write-through of a complete document (e.g. just created)."""
+        with self._lock:
+            self._wrote(uid)
+            if self.max_entries > 0:
+                self._remember(uid, dict(doc))
+
+    def update(self, uid: str, fields: dict) -> None:
+        """Apply a committed update (plain values, Increment, DELETE_FIELD) to the cached copy."""
+        with self._lock:
+            self._wrote(uid)
+            entry = self._entries.get(uid)
+            if entry is None:
+                return
+            stored_at, doc = entry
+            doc = dict(doc)
+            for key, value in fields.items():
+                if value is DELETE_FIELD:
+                    doc.pop(key, None)
+                elif isinstance(value, Increment):
+                    doc[key] = (doc.get(key) or 0) + value.value
+                else:
+                    doc[key] = value
+            # Keeps its original expiry: the write doesn't make other fields fresher
+            self._entries[uid] = (stored_at, doc)
+
+    def invalidate(self, uid: str) -> None:
+        with self._lock:
+            self._wrote(uid)
+            self._entries.pop(uid, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,458 @@
+"""
+In-process document store with the subset of the Firestore client API the
+backend uses, so firebase_service runs unchanged on top of it.
+
+Supported: collection / collection_group / document paths, get / set (merge)
+/ update / create / delete, dotted and FieldPath keys, Increment /
+DELETE_FIELD / ArrayUnion / ArrayRemove, where (incl. FieldFilter) /
+order_by / limit / select / start_after, stream, batches, get_all,
+transactions (driven by the SDK's `transactional` decorator) and query
+on_snapshot listeners (called synchronously after each commit that touches
+the query's collection, with `changes` always empty).
+
+Every write goes through `_atomic()`: changes are staged in an overlay and
+saved together when the outermost block exits, or dropped if it raises, so
+a batch is all-or-nothing like in Firestore. Subclasses only provide
+`_load`, `_load_children` and `_save` (see sqlite.py).
+"""
+import copy
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import DELETE_FIELD, Increment, ArrayUnion, ArrayRemove
+from google.cloud.firestore_v1.field_path import FieldPath
+
+
+def _parts(path) -> list[str]:
+    if isinstance(path, FieldPath):
+        return list(path.parts)
+    return list(FieldPath.from_string(path).parts)
+
+
+def _lookup(doc: dict, parts: list[str]):
+    cur = doc
+    for p in parts:
+        if not isinstance(cur, dict) or p not in cur:
+            return None, False
+        cur = cur[p]
+    return cur, True
+
+
+def _apply(doc: dict, parts: list[str], value) -> None:
+    cur = doc
+    for p in parts[:-1]:
+        nxt = cur.get(p)
+        if not isinstance(nxt, dict):
+            nxt = cur[p] = {}
+        cur = nxt
+    key = parts[-1]
+    if value is DELETE_FIELD:
+        cur.pop(key, None)
+    elif isinstance(value, Increment):
+        cur[key] = (cur.get(key) or 0) + value.value
+    elif isinstance(value, ArrayUnion):
+        arr = list(cur.get(key) or [])
+        cur[key] = arr + [v for v in value.values if v not in arr]
+    elif isinstance(value, ArrayRemove):
+        cur[key] = [v for v in (cur.get(key) or []) if v not in value.values]
+    else:
+        cur[key] = copy.deepcopy(value)
+
+
+def _merge(target: dict, data: dict) -> None:
+    for k, v in data.items():
+        if isinstance(v, dict):
+            if not isinstance(target.get(k), dict):
+                target[k] = {}
+            _merge(target[k], v)
+        else:
+            _apply(target, [k], v)
+
+
+def _parent_of(path: str) -> str:
+    return path.rsplit("/", 1)[0]
+
+
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: dict | None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return _lookup(self._data or {}, _parts(field))[0]
+
+
+class DocumentReference:
+    def __init__(self, client: "MemoryClient", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    @property
+    def parent(self) -> "CollectionReference":
+        return CollectionReference(self._client, _parent_of(self.path))
+
+    def collection(self, name: str) -> "CollectionReference":
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        return DocumentSnapshot(self, self._client._get(self.path))
+
+    def set(self, document_data: dict, merge: bool = False) -> None:
+        with self._client._atomic():
+            current = self._client._get(self.path) if merge else None
+            doc = copy.deepcopy(current) if current is not None else {}
+            _merge(doc, document_data)
+            self._client._put(self.path, doc)
+
+    def create(self, document_data: dict) -> None:
+        with self._client._atomic():
+            if self._client._get(self.path) is not None:
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            self.set(document_data)
+
+    def update(self, field_updates: dict) -> None:
+        with self._client._atomic():
+            current = self._client._get(self.path)
+            if current is None:
+                raise NotFound(f"No document to update: {self.path}")
+            doc = copy.deepcopy(current)
+            for key, value in field_updates.items():
+                _apply(doc, _parts(key), value)
+            self._client._put(self.path, doc)
+
+    def delete(self) -> None:
+        with self._client._atomic():
+            self._client._put(self.path, None)
+
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+
+class Query:
+    def __init__(self, client: "MemoryClient", parent: str, all_descendants: bool = False,
+                 filters=(), orders=(), limit=None, fields=None, cursor=None):
+        self._client = client
+        self._parent = parent
+        self._all_descendants = all_descendants
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._fields = fields
+        self._cursor = cursor
+
+    def _copy(self, **changes) -> "Query":
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     fields=self._fields, cursor=self._cursor)
+        state.update(changes)
+        return Query(self._client, self._parent, self._all_descendants, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None) -> "Query":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((_parts(field_path), op_string, value),))
+
+    def order_by(self, field_path, direction: str = "ASCENDING") -> "Query":
+        return self._copy(orders=self._orders + ((_parts(field_path), direction),))
+
+    def limit(self, count: int) -> "Query":
+        return self._copy(limit=count)
+
+    def select(self, field_paths) -> "Query":
+        return self._copy(fields=[_parts(f) for f in field_paths])
+
+    def start_after(self, document_fields_or_snapshot) -> "Query":
+        values = document_fields_or_snapshot
+        if isinstance(values, DocumentSnapshot):
+            values = values.to_dict()
+        return self._copy(cursor=values)
+
+    def _in_scope(self, path: str) -> bool:
+        collection = _parent_of(path)
+        if self._all_descendants:
+            return collection.rsplit("/", 1)[-1] == self._parent
+        return collection == self._parent
+
+    def on_snapshot(self, callback) -> "Watch":
+        watch = Watch(self, callback)
+        with self._client._lock:
+            self._client._watches.append(watch)
+            watch.fire()
+        return watch
+
+    def _matches(self, doc: dict) -> bool:
+        for parts, op, value in self._filters:
+            field, present = _lookup(doc, parts)
+            if not present:
+                return False
+            try:
+                if not _OPS[op](field, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _after_cursor(self, doc: dict) -> bool:
+        for parts, direction in self._orders:
+            cursor_value, _ = _lookup(self._cursor, parts)
+            value, _ = _lookup(doc, parts)
+            if value == cursor_value:
+                continue
+            return value < cursor_value if direction == "DESCENDING" else value > cursor_value
+        return False
+
+    def stream(self, transaction=None):
+        rows = [(p, d) for p, d in self._client._scan(self._parent, self._all_descendants) if self._matches(d)]
+        for parts, direction in reversed(self._orders):
+            rows = [(p, d) for p, d in rows if _lookup(d, parts)[1]]
+            rows.sort(key=lambda row: _lookup(row[1], parts)[0], reverse=direction == "DESCENDING")
+        if self._cursor is not None:
+            rows = [(p, d) for p, d in rows if self._after_cursor(d)]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for path, doc in rows:
+            if self._fields is not None:
+                selected: dict = {}
+                for parts in self._fields:
+                    value, present = _lookup(doc, parts)
+                    if present:
+                        _apply(selected, parts, value)
+                doc = selected
+            yield DocumentSnapshot(DocumentReference(self._client, path), doc)
+
+    def get(self, transaction=None) -> list[DocumentSnapshot]:
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client: "MemoryClient", path: str):
+        super().__init__(client, path)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> DocumentReference | None:
+        return DocumentReference(self._client, _parent_of(self.path)) if "/" in self.path else None
+
+    def document(self, document_id: str | None = None) -> DocumentReference:
+        return DocumentReference(self._client, f"{self.path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, document_data: dict, document_id: str | None = None):
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return None, ref
+
+
+class Watch:
+    def __init__(self, query: Query, callback):
+        self._query = query
+        self._callback = callback
+        self._closed = False  # same attribute the Firestore SDK's Watch sets
+
+    def fire(self) -> None:
+        self._callback(self._query.get(), [], datetime.now(timezone.utc))
+
+    def unsubscribe(self) -> None:
+        self._closed = True
+        with self._query._client._lock:
+            if self in self._query._client._watches:
+                self._query._client._watches.remove(self)
+
+
+class WriteBatch:
+    def __init__(self, client: "MemoryClient"):
+        self._client = client
+        self._ops: list = []
+
+    def set(self, reference: DocumentReference, document_data: dict, merge: bool = False):
+        self._ops.append(lambda: reference.set(document_data, merge=merge))
+        return self
+
+    def create(self, reference: DocumentReference, document_data: dict):
+        self._ops.append(lambda: reference.create(document_data))
+        return self
+
+    def update(self, reference: DocumentReference, field_updates: dict):
+        self._ops.append(lambda: reference.update(field_updates))
+        return self
+
+    def delete(self, reference: DocumentReference):
+        self._ops.append(reference.delete)
+        return self
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        with self._client._atomic():
+            for op in ops:
+                op()
+        return []
+
+
+class Transaction(WriteBatch):
+    """Holds the store lock from begin to commit / rollback, so transactions
+    are serialized and never need to retry."""
+
+    def __init__(self, client: "MemoryClient", max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _clean_up(self) -> None:
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None) -> None:
+        self._client._lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _rollback(self) -> None:
+        if self._id is not None:
+            self._clean_up()
+            self._client._lock.release()
+
+    def _commit(self) -> list:
+        try:
+            return self.commit()
+        finally:
+            self._clean_up()
+            self._client._lock.release()
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+    def get_all(self, references, **kwargs):
+        return self._client.get_all(references)
+
+
+class MemoryClient:
+    """Documents in a dict per collection path; lost when the process exits."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pending: dict[str, dict | None] | None = None
+        self._collections: dict[str, dict[str, dict]] = {}
+        self._watches: list[Watch] = []
+
+    # --- Firestore client API ---
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def collection_group(self, collection_id: str) -> Query:
+        return Query(self, collection_id, all_descendants=True)
+
+    def document(self, path: str) -> DocumentReference:
+        return DocumentReference(self, path)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> Transaction:
+        return Transaction(self, max_attempts, read_only)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for ref in references:
+            yield ref.get()
+
+    # --- Storage primitives ---
+
+    @contextmanager
+    def _atomic(self):
+        """Stage writes made inside the block and save them together on exit."""
+        with self._lock:
+            if self._pending is not None:
+                yield
+                return
+            self._pending = {}
+            try:
+                yield
+                changes = self._pending
+                if changes:
+                    self._save(changes)
+            finally:
+                self._pending = None
+            if changes:
+                for watch in list(self._watches):
+                    if any(watch._query._in_scope(path) for path in changes):
+                        watch.fire()
+
+    def _get(self, path: str) -> dict | None:
+        with self._lock:
+            if self._pending is not None and path in self._pending:
+                return self._pending[path]
+            return self._load(path)
+
+    def _put(self, path: str, doc: dict | None) -> None:
+        self._pending[path] = doc
+
+    def _scan(self, parent: str, all_descendants: bool) -> list[tuple[str, dict]]:
+        """(path, doc) for every document directly under `parent`, or in any
+        collection named `parent` when `all_descendants` is set."""
+        scope = Query(self, parent, all_descendants)
+        with self._lock:
+            rows = dict(self._load_children(parent, all_descendants))
+            for path, doc in (self._pending or {}).items():
+                if scope._in_scope(path):
+                    if doc is None:
+                        rows.pop(path, None)
+                    else:
+                        rows[path] = doc
+        return list(rows.items())
+
+    # Stored dicts are never mutated in place (writes replace them), so reads
+    # can hand them out without copying; snapshots copy on to_dict().
+
+    def _load(self, path: str) -> dict | None:
+        return self._collections.get(_parent_of(path), {}).get(path)
+
+    def _load_children(self, parent: str, all_descendants: bool):
+        if not all_descendants:
+            return list(self._collections.get(parent, {}).items())
+        return [
+            row
+            for collection, docs in self._collections.items()
+            if collection.rsplit("/", 1)[-1] == parent
+            for row in docs.items()
+        ]
+
+    def _save(self, changes: dict[str, dict | None]) -> None:
+        for path, doc in changes.items():
+            docs = self._collections.setdefault(_parent_of(path), {})
+            if doc is None:
+                docs.pop(path, None)
+            else:
+                docs[path] = doc
@@ -0,0 +1,82 @@
+"""
+SQLite-backed document store: the in-memory client's API and semantics,
+persisted to one file (one row per document, JSON body).
+
+Queries load the documents of one collection and filter / sort them in
+Python, so this is meant for local development and CI, not large datasets.
+"""
+import json
+import sqlite3
+from datetime import datetime
+from app.storage.memory import MemoryClient, _parent_of
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    collection_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_parent ON documents (parent);
+CREATE INDEX IF NOT EXISTS documents_collection_id ON documents (collection_id);
+"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in SQLite backend")
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _loads(data: str) -> dict:
+    return json.loads(data, object_hook=_decode)
+
+
+class SqliteClient(MemoryClient):
+    def __init__(self, path: str):
+        super().__init__()
+        self.db_path = path
+        # One connection shared by all threads; every access holds self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, path: str) -> dict | None:
+        row = self._conn.execute("SELECT data FROM documents WHERE path = ?", (path,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def _load_children(self, parent: str, all_descendants: bool):
+        column = "collection_id" if all_descendants else "parent"
+        rows = self._conn.execute(f"SELECT path, data FROM documents WHERE {column} = ?", (parent,))
+        return [(path, _loads(data)) for path, data in rows]
+
+    def _save(self, changes: dict[str, dict | None]) -> None:
+        upserts = []
+        deletes = []
+        for path, doc in changes.items():
+            if doc is None:
+                deletes.append((path,))
+            else:
+                parent = _parent_of(path)
+                upserts.append((path, parent, parent.rsplit("/", 1)[-1], json.dumps(doc, default=_encode)))
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany("DELETE FROM documents WHERE path = ?", deletes)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (path, parent, collection_id, data) VALUES (?, ?, ?, ?)",
+                upserts,
+            )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
@@ -0,0 +1,32 @@
+"""
+Maintenance script – backfills derived fields on existing Firestore documents.
+Run:  python backfill.py geohash    # add geohash to reports created before it existed
+      python backfill.py counters   # recount dashboard totals into the counter shards
+Uses the same credentials as the backend (.env / serviceAccountKey.json).
+"""
+import argparse
+from app.services import firebase_service as fs
+
+
+def backfill_geohash():
+    updated = fs.backfill_report_geohashes()
+    print(f"Added geohash to {updated} report(s).")
+
+
+def backfill_counters():
+    totals = fs.rebuild_dashboard_counters()
+    for field, value in totals.items():
+        print(f"  {field}: {value}")
+
+
+COMMANDS = {
+    "geohash": backfill_geohash,
+    "counters": backfill_counters,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill derived fields on existing documents.")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    COMMANDS[args.command]()
@@ -0,0 +1,188 @@
+"""
+Equivalence check for the NumPy detection post-processing (_Predictions).
+
+Runs random Roboflow prediction sets through inference._build_detection and
+through the list-based implementation it replaced (kept below as
+`reference_detection`), and compares the results field by field. Also checks
+the cleanup confidence count, and _Predictions.nms against a plain-Python
+greedy NMS.
+
+Known, intended difference: a prediction whose "class" is present but empty
+("") used to keep class_name "" and now gets "unknown" (the same name a
+missing class always got). The check normalizes that before comparing.
+
+Run from backend/ (no credentials or network needed):
+
+    python -m benchmarks.check_detection
+    python -m benchmarks.check_detection --sets 1000 --boxes 300 --seed 7
+
+Exits with status 1 if any set differs.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing app.* sets up storage; a local backend needs no credentials
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from app.services import inference  # noqa: E402
+from app.services.inference import (  # noqa: E402
+    CLEANUP_CONFIDENCE, CROP_RATIO, WASTE_COLORS, _Predictions, _build_detection,
+    _map_class_to_waste_type, _severity_from_count,
+)
+
+CLASSES = ["plastic bottle", "plastic bag", "can", "food waste", "paper", "cigarette", "glass", "", None]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=200, help="random prediction sets (default 200)")
+    parser.add_argument("--boxes", type=int, default=200, help="max boxes per set (default 200)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    return parser.parse_args()
+
+
+# ── Previous implementation ─────────────
+
+def _is_in_center(pred: dict, img_w: int, img_h: int, ratio: float = CROP_RATIO) -> bool:
+    margin_x = img_w * (1 - ratio) / 2
+    margin_y = img_h * (1 - ratio) / 2
+    cx = pred.get("x", 0)
+    cy = pred.get("y", 0)
+    return margin_x <= cx <= img_w - margin_x and margin_y <= cy <= img_h - margin_y
+
+
+def reference_detection(predictions: list[dict], image_info: dict, orig_w: int, orig_h: int) -> dict:
+    """_build_detection before it was vectorized (no confidence threshold, no NMS)."""
+    robo_w = image_info.get("width", 0)
+    robo_h = image_info.get("height", 0)
+    sx = orig_w / robo_w if robo_w else 1
+    sy = orig_h / robo_h if robo_h else 1
+
+    detections = []
+    for p in predictions:
+        if robo_w and robo_h and not _is_in_center(p, robo_w, robo_h, CROP_RATIO):
+            continue
+        waste_type = _map_class_to_waste_type(p.get("class", ""))
+        detections.append({
+            "x": p.get("x", 0) * sx,
+            "y": p.get("y", 0) * sy,
+            "width": p.get("width", 0) * sx,
+            "height": p.get("height", 0) * sy,
+            "class_name": p.get("class", "unknown"),
+            "confidence": round(p.get("confidence", 0), 3),
+            "waste_type": waste_type,
+            "color": WASTE_COLORS.get(waste_type, "#FCC419"),
+        })
+
+    if detections:
+        best = max(detections, key=lambda d: d["confidence"])
+        primary_type = best["waste_type"]
+    else:
+        primary_type = "mixed"
+
+    return {
+        "detections": detections,
+        "summary": {
+            "total_count": len(detections),
+            "waste_type": primary_type,
+            "severity": _severity_from_count(len(detections)),
+        },
+        "image_width": orig_w,
+        "image_height": orig_h,
+    }
+
+
+def reference_nms(predictions: list[dict], iou_threshold: float) -> list[int]:
+    """Greedy class-agnostic NMS, one box at a time; kept indices in original order."""
+    def corners(p):
+        return (p["x"] - p["width"] / 2, p["y"] - p["height"] / 2,
+                p["x"] + p["width"] / 2, p["y"] + p["height"] / 2)
+
+    def iou(a, b):
+        ax1, ay1, ax2, ay2 = corners(a)
+        bx1, by1, bx2, by2 = corners(b)
+        inter = max(min(ax2, bx2) - max(ax1, bx1), 0) * max(min(ay2, by2) - max(ay1, by1), 0)
+        union = a["width"] * a["height"] + b["width"] * b["height"] - inter
+        return inter / union if union > 0 else 0.0
+
+    order = sorted(range(len(predictions)), key=lambda i: -predictions[i]["confidence"])
+    keep = []
+    while order:
+        i, order = order[0], order[1:]
+        keep.append(i)
+        order = [j for j in order if iou(predictions[i], predictions[j]) <= iou_threshold]
+    return sorted(keep)
+
+
+# ── Random inputs ───────────────────────
+
+def random_predictions(rng: random.Random, max_boxes: int, img_w: int, img_h: int) -> list[dict]:
+    predictions = []
+    for _ in range(rng.randint(0, max_boxes)):
+        p = {
+            "x": rng.uniform(0, img_w), "y": rng.uniform(0, img_h),
+            "width": rng.choice([0.0, rng.uniform(1, img_w / 4)]),
+            "height": rng.choice([0.0, rng.uniform(1, img_h / 4)]),
+            # Coarse values so ties and exact-half rounding come up
+            "confidence": rng.choice([rng.random(), round(rng.random(), 4), 0.5]),
+        }
+        label = rng.choice(CLASSES)
+        if label is not None:
+            p["class"] = label
+        if rng.random() < 0.02:
+            del p[rng.choice(["x", "y", "width", "height", "confidence"])]
+        predictions.append(p)
+    return predictions
+
+
+def _normalize(result: dict) -> dict:
+    """Apply the intended "" → "unknown" class-name change to a reference result."""
+    for d in result["detections"]:
+        if d["class_name"] == "":
+            d["class_name"] = "unknown"
+    return result
+
+
+def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    # The previous implementation had neither setting; compare with both off
+    inference.INFERENCE_MIN_CONFIDENCE = 0.0
+    inference.INFERENCE_NMS_IOU = 0.0
+
+    detection_diffs = cleanup_diffs = nms_diffs = 0
+    for n in range(args.sets):
+        img_w, img_h = rng.choice([(640, 480), (1280, 720), (0, 0)])
+        orig_w, orig_h = rng.choice([(img_w, img_h), (4032, 3024), (1000, 1000)])
+        predictions = random_predictions(rng, args.boxes, img_w or 640, img_h or 480)
+        image_info = {"width": img_w, "height": img_h} if img_w else {}
+
+        new = _build_detection(predictions, image_info, orig_w, orig_h)
+        old = _normalize(reference_detection(predictions, image_info, orig_w, orig_h))
+        if new != old:
+            detection_diffs += 1
+            print(f"set {n}: _build_detection differs "
+                  f"({new['summary']['total_count']} vs {old['summary']['total_count']} detections)")
+
+        old_count = sum(1 for p in predictions if p.get("confidence", 0) >= CLEANUP_CONFIDENCE)
+        if len(_Predictions.from_list(predictions).filtered(CLEANUP_CONFIDENCE)) != old_count:
+            cleanup_diffs += 1
+            print(f"set {n}: cleanup confidence count differs")
+
+        complete = [p for p in predictions if all(k in p for k in ("x", "y", "width", "height", "confidence"))]
+        for iou_threshold in (0.3, 0.5, 0.7):
+            kept = _Predictions.from_list(complete).nms(iou_threshold).tolist() if complete else []
+            if kept != reference_nms(complete, iou_threshold):
+                nms_diffs += 1
+                print(f"set {n}: nms(iou={iou_threshold}) differs")
+
+    print(f"{args.sets} prediction sets: {detection_diffs} detection, {cleanup_diffs} cleanup, "
+          f"{nms_diffs} NMS differences")
+    return 1 if detection_diffs or cleanup_diffs or nms_diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Offline load test for the EcoMap API.
+
+Boots app.main:app in-process against a local storage backend
+(STORAGE_BACKEND=memory by default, or --storage sqlite), a stub
+Roboflow client and a fake Cloudinary uploader (see stubs.py), seeds
+users / reports / rewards, then drives a weighted mix of requests and
+prints p50/p95/p99 latency and requests/sec per scenario.
+
+Run from backend/ (no credentials or network needed):
+
+    python -m benchmarks.run
+    python -m benchmarks.run --requests 5000 --concurrency 64
+    python -m benchmarks.run --mix report=1,map=4,dashboard=2,redeem=1,detect=2 \\
+        --inference-latency 0.4 --unique-images 0.5 --json results.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import stubs  # noqa: E402
+
+# Cebu City area, where the seed scripts put their reports
+CEBU_BBOX = (10.25, 123.84, 10.40, 123.96)
+
+DEFAULT_MIX = "report=2,map=4,map_bbox=2,dashboard=2,rewards=2,redeem=1,detect=2"
+
+# Statuses that are a correct answer for the scenario (e.g. cooldown 429)
+EXPECTED_STATUS = {
+    "report": {200, 429},
+    "redeem": {200, 400},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests (default 2000)")
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests first (default 100)")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients (default 32)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario=weight list (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=200, help="seeded users (default 200)")
+    parser.add_argument("--reports", type=int, default=2000, help="seeded reports (default 2000)")
+    parser.add_argument("--rewards", type=int, default=10, help="seeded rewards (default 10)")
+    parser.add_argument("--stock-shards", type=int, default=0, help="spread each reward's stock over N shards")
+    parser.add_argument("--inference-latency", type=float, default=0.25, help="stub Roboflow seconds per call")
+    parser.add_argument("--upload-latency", type=float, default=0.15, help="fake Cloudinary seconds per upload")
+    parser.add_argument("--boxes", type=int, default=20, help="boxes per stub detection (default 20)")
+    parser.add_argument("--unique-images", type=float, default=1.0,
+                        help="fraction of detect requests with a never-seen image (rest hit the cache)")
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory",
+                        help="storage backend (sqlite uses a temporary file)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    return parser.parse_args()
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _random_point(rng: random.Random) -> tuple[float, float]:
+    min_lat, min_lng, max_lat, max_lng = CEBU_BBOX
+    return rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)
+
+
+def _jpeg(seed: int) -> bytes:
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (seed % 256, (seed // 256) % 256, 128)).save(buf, "JPEG", quality=80)
+    return buf.getvalue()
+
+
+class Workload:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users: list[str] = []
+        self.rewards: list[str] = []
+        self.images = [_jpeg(i) for i in range(16)]
+        self.image_counter = 1000
+
+    def seed(self):
+        from app.services import firebase_service as fs
+
+        for i in range(self.args.users):
+            uid = f"bench_user_{i}"
+            fs.create_user({"uid": uid, "full_name": f"Bench User {i}", "email": f"{uid}@bench.local"})
+            fs.update_user(uid, {"eco_points_balance": 1_000_000})
+            self.users.append(uid)
+        for i in range(self.args.reports):
+            lat, lng = _random_point(self.rng)
+            fs.create_report({
+                "user_id": self.rng.choice(self.users), "image_url": "",
+                "geo_lat": lat, "geo_lng": lng,
+                "waste_type": self.rng.choice(["plastic", "mixed", "metal", "paper"]),
+                "severity": self.rng.choice(["low", "medium", "high", "critical"]),
+                "ai_confidence": 0.8, "trash_count": self.rng.randint(1, 5),
+            })
+        for i in range(self.args.rewards):
+            reward = fs.create_reward({"name": f"Bench Reward {i}", "points_required": 10, "stock": 1_000_000})
+            if self.args.stock_shards:
+                fs.update_reward(reward["reward_id"], {"stock_shards": self.args.stock_shards})
+            self.rewards.append(reward["reward_id"])
+
+    def detect_image(self) -> bytes:
+        if self.rng.random() < self.args.unique_images:
+            self.image_counter += 1
+            return _jpeg(self.image_counter)
+        return self.rng.choice(self.images)
+
+
+async def _report(client, w: Workload):
+    lat, lng = _random_point(w.rng)
+    return await client.post("/api/reports", json={
+        "user_id": w.rng.choice(w.users), "image_url": "https://res.cloudinary.invalid/x.jpg",
+        "geo_lat": lat, "geo_lng": lng, "waste_type": "plastic", "severity": "medium",
+        "ai_confidence": 0.8, "trash_count": 2,
+    })
+
+
+async def _map(client, w: Workload):
+    return await client.get("/api/reports", params={"limit": 50})
+
+
+async def _map_bbox(client, w: Workload):
+    lat, lng = _random_point(w.rng)
+    return await client.get("/api/reports", params={"bbox": f"{lat - 0.02},{lng - 0.02},{lat + 0.02},{lng + 0.02}"})
+
+
+async def _heatmap(client, w: Workload):
+    return await client.get("/api/reports/heatmap", params={"bbox": ",".join(map(str, CEBU_BBOX)), "zoom": 13})
+
+
+async def _dashboard(client, w: Workload):
+    return await client.get("/api/dashboard/stats")
+
+
+async def _rewards(client, w: Workload):
+    return await client.get("/api/rewards")
+
+
+async def _redeem(client, w: Workload):
+    return await client.post("/api/rewards/redeem", json={
+        "user_id": w.rng.choice(w.users), "reward_id": w.rng.choice(w.rewards),
+    })
+
+
+async def _detect(client, w: Workload):
+    return await client.post(
+        "/api/detect/upload", content=w.detect_image(), headers={"content-type": "image/jpeg"},
+    )
+
+
+async def _scan(client, w: Workload):
+    return await client.post("/api/scan", content=w.detect_image(), headers={"content-type": "image/jpeg"})
+
+
+SCENARIOS = {
+    "report": _report,
+    "map": _map,
+    "map_bbox": _map_bbox,
+    "heatmap": _heatmap,
+    "dashboard": _dashboard,
+    "rewards": _rewards,
+    "redeem": _redeem,
+    "detect": _detect,
+    "scan": _scan,
+}
+
+
+async def drive(client, workload: Workload, mix: dict[str, float], total: int, concurrency: int):
+    """Run `total` requests from `concurrency` workers; returns ({scenario: [(status, seconds)]}, wall)."""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    results: dict[str, list[tuple[int, float]]] = defaultdict(list)
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            name = workload.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = (await SCENARIOS[name](client, workload)).status_code
+            except Exception:
+                status = 0
+            results[name].append((status, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, wall: float) -> list[dict]:
+    rows = []
+    everything = []
+    for name in sorted(results):
+        samples = results[name]
+        latencies = np.array([s for _, s in samples]) * 1000
+        everything.append(latencies)
+        ok = EXPECTED_STATUS.get(name, {200})
+        rows.append({
+            "scenario": name,
+            "requests": len(samples),
+            "errors": sum(1 for status, _ in samples if status not in ok),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "rps": len(samples) / wall,
+        })
+    if everything:
+        latencies = np.concatenate(everything)
+        rows.append({
+            "scenario": "TOTAL",
+            "requests": len(latencies),
+            "errors": sum(r["errors"] for r in rows),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "rps": len(latencies) / wall,
+        })
+    return rows
+
+
+def print_table(rows: list[dict]) -> None:
+    header = f"{'scenario':<12}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['scenario']:<12}{r['requests']:>10}{r['errors']:>8}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}{r['rps']:>10.1f}"
+        )
+
+
+async def main_async(args) -> list[dict]:
+    import httpx
+    from app.main import app
+
+    mix = parse_mix(args.mix)
+    workflow = stubs.install_services(args.inference_latency, args.upload_latency, args.boxes)
+    workload = Workload(args)
+
+    started = time.perf_counter()
+    workload.seed()
+    print(f"Seeded {args.users} users, {args.reports} reports, {args.rewards} rewards "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    # ASGITransport doesn't send lifespan events, so run startup / shutdown here
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            if args.warmup:
+                await drive(client, workload, mix, args.warmup, args.concurrency)
+            results, wall = await drive(client, workload, mix, args.requests, args.concurrency)
+
+    rows = summarize(results, wall)
+    print(f"\n{args.requests} requests, concurrency {args.concurrency}, {wall:.2f}s wall, "
+          f"{workflow.calls} Roboflow calls (stub latency {args.inference_latency * 1000:.0f} ms)\n")
+    print_table(rows)
+    return rows
+
+
+def main():
+    args = parse_args()
+    os.environ["STORAGE_BACKEND"] = args.storage
+    if args.storage == "sqlite":
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="ecomap-bench-"), "bench.sqlite3")
+    rows = asyncio.run(main_async(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
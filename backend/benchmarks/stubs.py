@@ -0,0 +1,63 @@
+"""
+Local stand-ins for the backend's external services.
+
+- Firestore: not stubbed here – run.py selects STORAGE_BACKEND=memory (or
+  sqlite) before importing the app.
+- Roboflow: StubWorkflowClient sleeps for a configurable latency (in the
+  inference worker thread, like the real HTTP call) and returns boxes.
+- Cloudinary: `fake_upload` sleeps on the event loop and returns a URL.
+"""
+import asyncio
+import random
+import time
+
+
+class StubWorkflowClient:
+    """Answers run_workflow like the Roboflow workflow, after `latency` seconds."""
+
+    CLASSES = ["plastic bottle", "plastic bag", "can", "food waste", "paper", "cigarette"]
+
+    def __init__(self, latency: float, boxes: int):
+        self.latency = latency
+        self.boxes = boxes
+        self.calls = 0
+
+    def _entry(self) -> dict:
+        rng = random.Random()
+        return {
+            "predictions": {
+                "image": {"width": 640, "height": 480},
+                "predictions": [
+                    {
+                        "x": rng.uniform(40, 600), "y": rng.uniform(40, 440),
+                        "width": rng.uniform(10, 80), "height": rng.uniform(10, 80),
+                        "confidence": rng.uniform(0.3, 0.99),
+                        "class": rng.choice(self.CLASSES),
+                    }
+                    for _ in range(self.boxes)
+                ],
+            }
+        }
+
+    def run_workflow(self, images: dict, **kwargs) -> list[dict]:
+        self.calls += 1
+        time.sleep(self.latency)
+        inputs = images["image"]
+        count = len(inputs) if isinstance(inputs, list) else 1
+        return [self._entry() for _ in range(count)]
+
+
+def install_services(inference_latency: float, upload_latency: float, boxes: int) -> StubWorkflowClient:
+    """Swap Roboflow and Cloudinary for stubs (call after importing app.main)."""
+    from app.routes import api
+    from app.services import inference
+
+    workflow = StubWorkflowClient(inference_latency, boxes)
+    inference._client = workflow
+
+    async def fake_upload(file_bytes: bytes, folder: str = "ecomap_reports") -> str:
+        await asyncio.sleep(upload_latency)
+        return f"https://res.cloudinary.invalid/{folder}/{len(file_bytes)}.jpg"
+
+    api.upload_image_async = fake_upload
+    return workflow
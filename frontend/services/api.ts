@@ -62,11 +62,20 @@ export async function updateUser(uid: string, data: Record<string, any>) {
 
 // ─── Reports ──────────────────────────
 
-export async function fetchReports(params?: { waste_type?: string; severity?: string; limit?: number }) {
+export async function fetchReports(params?: {
+  waste_type?: string;
+  severity?: string;
+  limit?: number;
+  bbox?: { min_lat: number; min_lng: number; max_lat: number; max_lng: number };
+}) {
   const query = new URLSearchParams();
   if (params?.waste_type) query.set("waste_type", params.waste_type);
   if (params?.severity) query.set("severity", params.severity);
   if (params?.limit) query.set("limit", String(params.limit));
+  if (params?.bbox) {
+    const b = params.bbox;
+    query.set("bbox", [b.min_lat, b.min_lng, b.max_lat, b.max_lng].join(","));
+  }
   const qs = query.toString();
   return request(`/reports${qs ? `?${qs}` : ""}`);
 }
@@ -90,6 +99,21 @@ export async function submitReport(data: {
   return request("/reports", { method: "POST", body: JSON.stringify(data) });
 }
 
+export async function fetchHeatmap(params: {
+  min_lat: number;
+  min_lng: number;
+  max_lat: number;
+  max_lng: number;
+  zoom: number;
+  waste_type?: string;
+}) {
+  const query = new URLSearchParams();
+  query.set("bbox", [params.min_lat, params.min_lng, params.max_lat, params.max_lng].join(","));
+  query.set("zoom", String(Math.round(params.zoom)));
+  if (params.waste_type) query.set("waste_type", params.waste_type);
+  return request(`/reports/heatmap?${query.toString()}`);
+}
+
 // ─── Jobs ─────────────────────────────
 
 export async function fetchJobs() {
@@ -227,6 +251,26 @@ export async function uploadImage(fileUri: string) {
 // analyzeWaste and detectObjects have been moved to frontend/services/roboflow.ts
 // for direct Roboflow API calls, bypassing the backend server.
 
+// One round trip: uploads the photo once and returns detection boxes,
+// the analysis summary and the Cloudinary image URL together.
+export async function scanImage(fileUri: string) {
+  const formData = new FormData();
+  const filename = fileUri.split("/").pop() || "photo.jpg";
+  formData.append("file", {
+    uri: fileUri,
+    name: filename,
+    type: "image/jpeg",
+  } as any);
+
+  const res = await fetch(`${API_BASE_URL}/api/scan`, {
+    method: "POST",
+    body: formData,
+    headers: {},
+  });
+  if (!res.ok) throw new Error(`API ${res.status}: ${await res.text()}`);
+  return res.json();
+}
+
 // ─── Cleanup Verification ─────────────
 
 export async function verifyCleanup(
@@ -250,6 +294,26 @@ export async function verifyCleanup(
   });
 }
 
+// Same as verifyCleanup, but sends the photo file as multipart instead of base64.
+export async function verifyCleanupUpload(reportId: string, userId: string, fileUri: string) {
+  const formData = new FormData();
+  const filename = fileUri.split("/").pop() || "photo.jpg";
+  formData.append("file", {
+    uri: fileUri,
+    name: filename,
+    type: "image/jpeg",
+  } as any);
+
+  const url = `${API_BASE_URL}/api/reports/${reportId}/cleanup/upload?user_id=${encodeURIComponent(userId)}`;
+  const res = await fetch(url, {
+    method: "POST",
+    body: formData,
+    headers: {},
+  });
+  if (!res.ok) throw new Error(`API ${res.status}: ${await res.text()}`);
+  return res.json();
+}
+
 // ─── Dashboard ────────────────────────
 
 export async function fetchDashboardStats() {